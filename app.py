@@ -1,18 +1,55 @@
 from flask import Flask
 import os
-from extensions import db, login_manager
+from credentials import DEFAULT_METHOD
+from extensions import db, sqlite_profile, login_manager, fragment_cache, static_assets, compression, password_hasher, login_throttle, user_cache, query_instrumentation
 
 # 初始化Flask应用
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///site.db')
+app.config['SQLITE_PRAGMAS'] = {}  # 覆盖 database.DEFAULT_PRAGMAS 中的连接参数，例如 {'synchronous': 'FULL'}
+app.config['SQLITE_POOL_SIZE'] = 10  # 主连接池大小，按服务器线程数设置
+app.config['SQLITE_MAX_OVERFLOW'] = 10  # 连接池满时允许临时多开的连接数
+app.config['SQLITE_READ_POOL_SIZE'] = int(os.environ.get('SQLITE_READ_POOL_SIZE', 0))  # 大于 0 时 GET 请求的查询使用独立的只读连接池
 app.config['UPLOAD_FOLDER'] = 'static/profile_pics'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['FEED_PER_PAGE'] = 20  # 首页每页帖子数
+app.config['FEED_MAX_PER_PAGE'] = 100  # 每页帖子数上限
+app.config['COMMENTS_PER_PAGE'] = 50  # 帖子详情页每页评论数
+app.config['ADMIN_PER_PAGE'] = 50  # 后台审核列表每页条数
+app.config['SEARCH_PER_PAGE'] = 20  # 搜索结果每页条数
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 5000  # 片段缓存最多条目数
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = 16 * 1024 * 1024  # 片段缓存最大字节数
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600  # 带指纹的静态资源缓存一年
+app.config['COMPRESS_MIN_SIZE'] = 500  # 小于该字节数的响应不压缩
+app.config['PASSWORD_HASH_METHOD'] = DEFAULT_METHOD  # 密码 KDF，取自 PASSWORD_HASH_METHOD 环境变量（与 Streamlit 应用共用），可用 python credentials.py 按目标耗时选择
+app.config['PASSWORD_HASH_WORKERS'] = 2  # 密码哈希进程数
+app.config['PASSWORD_HASH_MAX_PENDING'] = 16  # 同时排队的哈希任务上限，超出返回繁忙
+app.config['LOGIN_MAX_FAILURES'] = 5  # 窗口期内允许的连续登录失败次数
+app.config['LOGIN_FAILURE_WINDOW'] = 300  # 登录失败计数窗口（秒）
+app.config['LOGIN_LOCKOUT_SECONDS'] = 300  # 超过失败次数后的锁定时间（秒）
+app.config['USER_CACHE_TTL'] = 60  # 会话用户缓存有效期（秒）
+app.config['USER_CACHE_SIZE'] = 1024  # 会话用户缓存条目上限
+app.config['STATS_DAYS'] = 30  # /admin/stats.json 返回最近多少天的每日发帖数
+app.config['STATS_TOKEN'] = os.environ.get('STATS_TOKEN')  # 监控抓取 /admin/stats.json 用的令牌
+app.config['SQL_INSTRUMENTATION'] = os.environ.get('SQL_INSTRUMENTATION') == '1'  # 按请求统计 SQL（响应头 X-Query-Count）
+app.config['SQL_QUERY_BUDGET'] = 10  # 单个请求的 SQL 条数预算，超出时写警告日志
+app.config['SQL_N_PLUS_ONE_THRESHOLD'] = 3  # 同一条 SQL 在一个请求中执行到该次数视为疑似 N+1
+app.config['SQL_DEBUG_PANEL'] = os.environ.get('SQL_DEBUG_PANEL') == '1'  # 在 HTML 页面底部显示 SQL 调试面板
 
-# 初始化扩展
+# 初始化扩展（引擎配置要在 db.init_app 之前）
+sqlite_profile.init_app(app)
 db.init_app(app)
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+fragment_cache.init_app(app)
+static_assets.init_app(app)
+compression.init_app(app)
+# 在压缩之后注册：after_request 逆序执行，调试面板要在压缩之前插入页面
+query_instrumentation.init_app(app)
+password_hasher.init_app(app)
+login_throttle.init_app(app)
+user_cache.init_app(app)
 
 # 确保上传文件夹存在
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
@@ -21,9 +58,13 @@ if not os.path.exists(app.config['UPLOAD_FOLDER']):
 # 导入模型和路由
 from models import *
 from routes import *
+from migrations import upgrade, upgrade_command, check_query_plans_command
+app.cli.add_command(upgrade_command)
+app.cli.add_command(check_query_plans_command)
 
 # 运行应用
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade()
     app.run(debug=True)
@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
 import os
-import hashlib
 from datetime import datetime
 import base64
+import data_store
+import avatars
+import credentials
 
 # 设置页面配置
 st.set_page_config(
@@ -50,103 +52,66 @@ COMMENTS_FILE = "data/comments.csv"
 LIKES_FILE = "data/likes.csv"
 ADMIN_REQUESTS_FILE = "data/admin_requests.csv"
 
-# 初始化数据文件
+# 帖子流每次加载的帖子数
+FEED_PAGE_SIZE = 10
+
+# 后台审核列表每页条数
+MODERATION_PAGE_SIZE = 20
+
+# 帖子搜索最多取回的结果数（在帖子流中按"加载更多"逐步显示），评论搜索每页条数
+SEARCH_MAX_POSTS = 200
+SEARCH_PAGE_SIZE = 20
+
+# 初始化数据文件（建库建表，首次运行时迁移旧的 CSV 数据；每个进程只执行一次）
 def init_data_files():
-    # 初始化用户文件
-    if not os.path.exists(USERS_FILE):
-        users_df = pd.DataFrame({
-            "nickname": [],
-            "password": [],
-            "role": [],  # parent or child
-            "avatar": [],
-            "is_admin": []  # 是否为管理员
-        })
-        users_df.to_csv(USERS_FILE, index=False)
-    
-    # 初始化帖子文件
-    if not os.path.exists(POSTS_FILE):
-        posts_df = pd.DataFrame({
-            "post_id": [],
-            "nickname": [],
-            "content": [],
-            "created_at": []
-        })
-        posts_df.to_csv(POSTS_FILE, index=False)
-    
-    # 初始化评论文件
-    if not os.path.exists(COMMENTS_FILE):
-        comments_df = pd.DataFrame({
-            "comment_id": [],
-            "post_id": [],
-            "nickname": [],
-            "content": [],
-            "created_at": []
-        })
-        comments_df.to_csv(COMMENTS_FILE, index=False)
-    
-    # 初始化点赞文件
-    if not os.path.exists(LIKES_FILE):
-        likes_df = pd.DataFrame({
-            "like_id": [],
-            "post_id": [],
-            "nickname": [],
-            "created_at": []
-        })
-        likes_df.to_csv(LIKES_FILE, index=False)
-    
-    # 初始化管理员请求文件
-    if not os.path.exists(ADMIN_REQUESTS_FILE):
-        admin_requests_df = pd.DataFrame({
-            "request_id": [],
-            "nickname": [],
-            "status": [],  # pending, approved, rejected
-            "created_at": []
-        })
-        admin_requests_df.to_csv(ADMIN_REQUESTS_FILE, index=False)
+    data_store.ensure_db([USERS_FILE, POSTS_FILE, COMMENTS_FILE, LIKES_FILE, ADMIN_REQUESTS_FILE])
 
 # 加载数据
 def load_data(file_path):
-    if os.path.exists(file_path):
-        return pd.read_csv(file_path)
-    return pd.DataFrame()
+    return data_store.load_table(data_store.table_name(file_path))
 
-# 保存数据
+# 保存数据（整表替换，增删改请使用 data_store 的 insert/update/delete）
 def save_data(df, file_path):
-    df.to_csv(file_path, index=False)
+    data_store.replace_table(df, data_store.table_name(file_path))
 
-# 密码加密
+# 密码加密（加盐的 KDF，与 Flask 应用共用 credentials 模块）
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return credentials.hash_password(password)
 
 # 检查昵称是否存在
 def nickname_exists(nickname):
-    users_df = load_data(USERS_FILE)
-    return nickname in users_df["nickname"].values
+    return nickname in data_store.user_index()
 
 # 获取用户角色
 def get_user_role(nickname):
-    users_df = load_data(USERS_FILE)
-    user = users_df[users_df["nickname"] == nickname]
-    if not user.empty:
-        return user.iloc[0]["role"]
+    user = data_store.user_index().get(nickname)
+    if user:
+        return user["role"]
     return None
 
 # 获取用户头像
 def get_user_avatar(nickname):
-    users_df = load_data(USERS_FILE)
-    user = users_df[users_df["nickname"] == nickname]
-    if not user.empty:
-        return user.iloc[0]["avatar"]
+    user = data_store.user_index().get(nickname)
+    if user:
+        return user["avatar"]
     return None
 
 # 验证用户登录
 def verify_login(nickname, password):
-    users_df = load_data(USERS_FILE)
-    user = users_df[users_df["nickname"] == nickname]
-    if user.empty:
+    user = data_store.user_index().get(nickname)
+    if not user or not credentials.verify_password(user["password"], password):
         return False
-    hashed_pw = hash_password(password)
-    return user.iloc[0]["password"] == hashed_pw
+    # 旧版 SHA-256 或旧参数的哈希在登录成功时升级
+    if credentials.needs_rehash(user["password"]):
+        data_store.update("users", {"password": hash_password(password)}, nickname=nickname)
+    return True
+
+# 头像图片路径，按显示宽度选择缩略图；没有头像时返回 None
+def avatar_path(avatar, width):
+    if not isinstance(avatar, str) or not avatar:
+        return None
+    path = f"avatars/{avatars.avatar_file('avatars', avatar, width)}"
+    return path if os.path.exists(path) else None
 
 # 获取角色对应的颜色
 def get_role_color(role):
@@ -158,78 +123,312 @@ def get_role_color(role):
 
 # 检查用户是否点赞了帖子
 def has_liked(post_id, nickname):
-    likes_df = load_data(LIKES_FILE)
-    return not likes_df[(likes_df["post_id"] == post_id) & (likes_df["nickname"] == nickname)].empty
+    return int(post_id) in data_store.like_index()["by_user"].get(nickname, set())
 
 # 获取帖子的点赞数
 def get_like_count(post_id):
-    likes_df = load_data(LIKES_FILE)
-    return len(likes_df[likes_df["post_id"] == post_id])
+    return data_store.like_index()["counts"].get(int(post_id), 0)
 
 # 切换点赞状态
 def toggle_like(post_id, nickname):
-    likes_df = load_data(LIKES_FILE)
-    if has_liked(post_id, nickname):
-        # 取消点赞
-        likes_df = likes_df[~((likes_df["post_id"] == post_id) & (likes_df["nickname"] == nickname))]
-    else:
-        # 添加点赞
-        new_like_id = len(likes_df) + 1
-        new_like = pd.DataFrame({
-            "like_id": [new_like_id],
-            "post_id": [post_id],
-            "nickname": [nickname],
-            "created_at": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-        })
-        likes_df = pd.concat([likes_df, new_like], ignore_index=True)
-    save_data(likes_df, LIKES_FILE)
+    return data_store.toggle_like(post_id, nickname, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+# 批量删除帖子及其评论和点赞：每张表一条语句，在同一事务中完成；返回实际删除的帖子数
+def delete_posts(post_ids):
+    post_ids = [int(post_id) for post_id in post_ids]
+    with data_store.transaction():
+        deleted = data_store.delete_many("posts", "post_id", post_ids)
+        data_store.delete_many("comments", "post_id", post_ids)
+        data_store.delete_many("likes", "post_id", post_ids)
+    return deleted
+
+# 删除帖子及其评论和点赞
+def delete_post(post_id):
+    delete_posts([post_id])
+
+# 发表评论
+def add_comment(post_id, nickname, content):
+    data_store.insert("comments", {
+        "post_id": int(post_id),
+        "nickname": nickname,
+        "content": content,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+
+# 删除评论
+def delete_comment(comment_id):
+    data_store.delete("comments", comment_id=int(comment_id))
+
+# 批量删除评论
+def delete_comments(comment_ids):
+    return data_store.delete_many("comments", "comment_id", [int(comment_id) for comment_id in comment_ids])
 
 # 检查用户是否为管理员
 def is_admin(nickname):
-    users_df = load_data(USERS_FILE)
-    user = users_df[users_df["nickname"] == nickname]
-    if not user.empty:
-        return user.iloc[0].get("is_admin", False)
+    user = data_store.user_index().get(nickname)
+    if user:
+        return bool(user["is_admin"])
     return False
 
 # 申请管理员权限
 def request_admin(nickname):
-    admin_requests_df = load_data(ADMIN_REQUESTS_FILE)
-    # 检查是否已有待处理的请求
-    existing_request = admin_requests_df[(admin_requests_df["nickname"] == nickname) & (admin_requests_df["status"] == "pending")]
-    if not existing_request.empty:
-        return False
-    
-    # 创建新请求
-    new_request_id = len(admin_requests_df) + 1
-    new_request = pd.DataFrame({
-        "request_id": [new_request_id],
-        "nickname": [nickname],
-        "status": ["pending"],
-        "created_at": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-    })
-    admin_requests_df = pd.concat([admin_requests_df, new_request], ignore_index=True)
-    save_data(admin_requests_df, ADMIN_REQUESTS_FILE)
+    with data_store.transaction():
+        # 检查是否已有待处理的请求
+        if data_store.find("admin_requests", nickname=nickname, status="pending"):
+            return False
+        
+        # 创建新请求
+        data_store.insert("admin_requests", {
+            "nickname": nickname,
+            "status": "pending",
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
     return True
 
 # 处理管理员请求
 def process_admin_request(request_id, action):
-    admin_requests_df = load_data(ADMIN_REQUESTS_FILE)
-    request = admin_requests_df[admin_requests_df["request_id"] == request_id]
-    if request.empty:
-        return False
+    request_id = int(request_id)
+    with data_store.transaction():
+        request = data_store.find("admin_requests", request_id=request_id)
+        if not request:
+            return False
+        
+        nickname = request[0]["nickname"]
+        data_store.update("admin_requests", {"status": action}, request_id=request_id)
+        
+        if action == "approved":
+            # 设置用户为管理员
+            data_store.update("users", {"is_admin": 1}, nickname=nickname)
     
-    nickname = request.iloc[0]["nickname"]
-    admin_requests_df.loc[admin_requests_df["request_id"] == request_id, "status"] = action
-    save_data(admin_requests_df, ADMIN_REQUESTS_FILE)
+    return True
+
+# 操作成功的提示：st.rerun() 会丢弃本次运行输出的内容，提示先存入 session_state，
+# 在重新运行后的页面标题下显示
+def flash(message):
+    st.session_state.flash = message
+
+def show_flash():
+    message = st.session_state.pop("flash", None)
+    if message:
+        st.success(message)
+
+# 角色后缀
+def role_suffix(role):
+    return "-家长" if role == "parent" else "-孩子" if role == "child" else ""
+
+# 渲染帖子流；posts_df 来自 data_store.feed_frame，已带作者角色和头像并按时间倒序
+# key_prefix 区分不同页面的组件 key；只渲染 session_state 中记录的窗口内的帖子
+def render_feed(posts_df, key_prefix, empty_message):
+    if posts_df.empty:
+        st.write(empty_message)
+        return
     
-    if action == "approved":
-        # 设置用户为管理员
-        users_df = load_data(USERS_FILE)
-        users_df.loc[users_df["nickname"] == nickname, "is_admin"] = True
-        save_data(users_df, USERS_FILE)
+    # 当前窗口大小，点击"加载更多"时扩大
+    limit_key = f"feed_limit_{key_prefix}"
+    if limit_key not in st.session_state:
+        st.session_state[limit_key] = FEED_PAGE_SIZE
+    visible_df = posts_df.head(st.session_state[limit_key])
     
-    return True
+    # 一次取出窗口内帖子的点赞数和点赞状态，以及按帖子分组的评论
+    likes = data_store.like_summary(visible_df["post_id"], st.session_state.user)
+    comments = data_store.comments_by_post()
+    
+    for _, post in visible_df.iterrows():
+        post_id = post["post_id"]
+        st.markdown("---")
+        
+        # 稍透明的蓝色卡片
+        st.markdown('<div class="post-section">', unsafe_allow_html=True)
+        
+        # 水平显示帖主信息
+        st.markdown('<div class="horizontal-user-info">', unsafe_allow_html=True)
+        avatar = avatar_path(post["avatar"], 50)
+        if avatar:
+            st.image(avatar, width=50)
+        st.markdown(f"<p style='color:black; font-weight:bold;'>{post['nickname']}{role_suffix(post['role'])}</p>", unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # 帖子内容
+        st.write(f"**{post['content']}**")
+        st.write(f"发布时间: {post['created_at']}")
+        
+        # 点赞和删除功能
+        if st.session_state.user:
+            col3, col4 = st.columns([1, 1])
+            with col3:
+                like_count, liked = likes[post_id]
+                if st.button(f"{'❤️' if liked else '🤍'} 点赞 ({like_count})", key=f"like_{key_prefix}{post_id}"):
+                    toggle_like(post_id, st.session_state.user)
+                    st.rerun()
+            with col4:
+                if post["nickname"] == st.session_state.user:
+                    if st.button("删除帖子", key=f"delete_post_{key_prefix}{post_id}"):
+                        # 删除帖子及相关评论和点赞
+                        delete_post(post_id)
+                        
+                        flash("帖子已删除")
+                        st.rerun()
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # 手风琴功能 - 折叠/展开评论
+        expanded_key = f"expanded_{post_id}"
+        if expanded_key not in st.session_state:
+            st.session_state[expanded_key] = False
+        
+        # 评论部分
+        st.markdown('<div class="comment-section">', unsafe_allow_html=True)
+        
+        # 本帖的评论
+        post_comments = comments.get(post_id, [])
+        comment_count = len(post_comments)
+        
+        # 显示评论标题和折叠/展开按钮（仅当有评论时显示按钮）
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown('<p style="font-size:16px; font-weight:bold;">评论:</p>', unsafe_allow_html=True)
+        with col2:
+            if comment_count > 0:
+                # 小按钮，显示评论总数
+                toggle_key = f"toggle_comment_{key_prefix}{post_id}_{comment_count}"
+                if st.button(f"{'展开' if not st.session_state[expanded_key] else '折叠'}({comment_count})", key=toggle_key, help="展开/折叠评论"):
+                    st.session_state[expanded_key] = not st.session_state[expanded_key]
+        
+        # 根据状态显示或隐藏评论
+        if st.session_state[expanded_key] or comment_count == 0:
+            if post_comments:
+                for comment in post_comments:
+                    # 稍透明的橙色卡片
+                    st.markdown('<div class="comment-card">', unsafe_allow_html=True)
+                    st.markdown(f"<p style='color:black; font-weight:bold;'>{comment['nickname']}{role_suffix(comment['role'])}</p>", unsafe_allow_html=True)
+                    st.markdown(f"<p style='font-weight:bold;'>{comment['content']}</p>", unsafe_allow_html=True)
+                    st.write(f"评论时间: {comment['created_at']}")
+                    
+                    # 删除评论功能
+                    if st.session_state.user and (comment["nickname"] == st.session_state.user):
+                        delete_key = f"delete_comment_{key_prefix}{comment['comment_id']}"
+                        if st.button(f"删除评论", key=delete_key):
+                            delete_comment(comment["comment_id"])
+                            st.success("评论已删除")
+                    st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                st.write("暂无评论")
+            
+            # 评论输入
+            if st.session_state.user:
+                comment_key = f"comment_{key_prefix}{post_id}_{comment_count}"
+                submit_key = f"submit_comment_{key_prefix}{post_id}_{comment_count}"
+                comment_content = st.text_area("写下你的评论...", key=comment_key)
+                if st.button("提交评论", key=submit_key):
+                    if comment_content:
+                        add_comment(post_id, st.session_state.user, comment_content)
+                        st.success("发表成功！")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # 加载更多
+    st.markdown("---")
+    st.write(f"已显示 {len(visible_df)} / {len(posts_df)} 条帖子")
+    if len(visible_df) < len(posts_df):
+        if st.button("加载更多", key=f"load_more_{key_prefix}"):
+            st.session_state[limit_key] += FEED_PAGE_SIZE
+            st.rerun()
+
+# 后台审核列表：筛选条件在数据库中执行，只取当前页，多选后批量删除
+def render_moderation(table, label):
+    key = data_store.PRIMARY_KEYS[table]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        nickname = st.text_input("作者昵称", key=f"mod_{table}_nickname").strip()
+    with col2:
+        role = st.selectbox("作者身份", ["全部", "家长", "孩子"], key=f"mod_{table}_role")
+    with col3:
+        date_from = st.date_input("开始日期", value=None, key=f"mod_{table}_from")
+    with col4:
+        date_to = st.date_input("结束日期", value=None, key=f"mod_{table}_to")
+    role = {"家长": "parent", "孩子": "child"}.get(role)
+    
+    page_key = f"mod_{table}_page"
+    page = st.session_state.get(page_key, 1)
+    rows, total = data_store.moderation_page(
+        table, nickname=nickname or None, role=role, date_from=date_from, date_to=date_to,
+        page=page, per_page=MODERATION_PAGE_SIZE
+    )
+    pages = max(1, -(-total // MODERATION_PAGE_SIZE))
+    if page > pages:
+        st.session_state[page_key] = pages
+        st.rerun()
+    if not rows:
+        st.write(f"暂无{label}")
+        return
+    
+    st.dataframe(pd.DataFrame(rows)[[key, "nickname", "role", "content", "created_at"]], hide_index=True)
+    by_id = {row[key]: row for row in rows}
+    selected = st.multiselect(
+        f"选择要删除的{label}", list(by_id), key=f"mod_{table}_selected",
+        format_func=lambda row_id: f"{row_id} · {by_id[row_id]['nickname']}: {by_id[row_id]['content'][:20]}"
+    )
+    if st.button(f"删除选中的{label} ({len(selected)})", key=f"mod_{table}_delete", disabled=not selected):
+        if table == "posts":
+            deleted = delete_posts(selected)
+        else:
+            deleted = delete_comments(selected)
+        flash(f"已删除 {deleted} 条{label}")
+        st.rerun()
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if page > 1 and st.button("上一页", key=f"mod_{table}_prev"):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+    with col2:
+        st.write(f"第 {page} / {pages} 页，共 {total} 条")
+    with col3:
+        if page < pages and st.button("下一页", key=f"mod_{table}_next"):
+            st.session_state[page_key] = page + 1
+            st.rerun()
+
+# 搜索页：帖子结果按相关度在帖子流中显示，评论结果分页列出
+def render_search():
+    query = st.text_input("关键词", key="search_query").strip()
+    scope = st.radio("范围", ["帖子", "评论"], horizontal=True, key="search_scope")
+    if not query:
+        return
+    users = data_store.user_index()
+    
+    if scope == "帖子":
+        rows, total = data_store.search_rows("posts", query, limit=SEARCH_MAX_POSTS)
+        st.write(f"找到 {total} 条帖子")
+        for row in rows:
+            author = users.get(row["nickname"], {})
+            row["role"] = author.get("role")
+            row["avatar"] = author.get("avatar")
+        render_feed(pd.DataFrame(rows), "search_", "没有找到相关帖子")
+        return
+    
+    page_key = "search_comments_page"
+    if st.session_state.get("search_comments_for") != query:
+        st.session_state["search_comments_for"] = query
+        st.session_state[page_key] = 1
+    page = st.session_state[page_key]
+    rows, total = data_store.search_rows("comments", query, SEARCH_PAGE_SIZE, (page - 1) * SEARCH_PAGE_SIZE)
+    pages = max(1, -(-total // SEARCH_PAGE_SIZE))
+    st.write(f"找到 {total} 条评论")
+    for row in rows:
+        st.markdown("---")
+        st.markdown(f"<p style='color:black; font-weight:bold;'>{row['nickname']}{role_suffix(users.get(row['nickname'], {}).get('role'))}</p>", unsafe_allow_html=True)
+        st.write(row["content"])
+        st.write(f"评论时间: {row['created_at']}（帖子ID: {row['post_id']}）")
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if page > 1 and st.button("上一页", key="search_prev"):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+    with col2:
+        st.write(f"第 {page} / {pages} 页")
+    with col3:
+        if page < pages and st.button("下一页", key="search_next"):
+            st.session_state[page_key] = page + 1
+            st.rerun()
 
 # 主页
 def main_page():
@@ -312,9 +511,9 @@ def main_page():
         if st.session_state.user:
             st.write(f"当前用户: {st.session_state.user}")
             # 显示用户头像
-            avatar = get_user_avatar(st.session_state.user)
-            if avatar and os.path.exists(f"avatars/{avatar}"):
-                st.image(f"avatars/{avatar}", width=50)
+            avatar = avatar_path(get_user_avatar(st.session_state.user), 50)
+            if avatar:
+                st.image(avatar, width=50)
     with col2:
         if st.session_state.user:
             if st.button("退出登录"):
@@ -323,147 +522,24 @@ def main_page():
     
     # 顶部导航菜单
     if st.session_state.user:
-        menu_options = ["我要发帖", "孩子的心声", "家长的困惑", "申请管理员"]
+        menu_options = ["我要发帖", "孩子的心声", "家长的困惑", "搜索", "申请管理员"]
         if is_admin(st.session_state.user):
-            menu_options.insert(4, "后台管理")
+            menu_options.insert(5, "后台管理")
         menu = st.radio("导航", menu_options, horizontal=True)
     else:
-        menu = st.radio("导航", ["首页", "注册", "登录"], horizontal=True)
+        menu = st.radio("导航", ["首页", "搜索", "注册", "登录"], horizontal=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
     st.title("心桥 - 连接亲子的桥梁")
+    show_flash()
     
     # 首页
     if menu == "首页":
         st.subheader("分享你的故事")
         
         # 显示所有帖子
-        posts_df = load_data(POSTS_FILE)
-        if not posts_df.empty:
-            # 按时间倒序排列
-            posts_df = posts_df.sort_values("created_at", ascending=False)
-            
-            for _, post in posts_df.iterrows():
-                st.markdown("---")
-                
-                # 稍透明的蓝色卡片
-                st.markdown('<div class="post-section">', unsafe_allow_html=True)
-                
-                # 水平显示帖主信息
-                st.markdown('<div class="horizontal-user-info">', unsafe_allow_html=True)
-                avatar = get_user_avatar(post["nickname"])
-                if avatar and os.path.exists(f"avatars/{avatar}"):
-                    st.image(f"avatars/{avatar}", width=50)
-                role = get_user_role(post["nickname"])
-                role_suffix = "-家长" if role == "parent" else "-孩子" if role == "child" else ""
-                st.markdown(f"<p style='color:black; font-weight:bold;'>{post['nickname']}{role_suffix}</p>", unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 帖子内容
-                st.write(f"**{post['content']}**")
-                st.write(f"发布时间: {post['created_at']}")
-                
-                # 点赞和删除功能
-                if st.session_state.user:
-                    col3, col4 = st.columns([1, 1])
-                    with col3:
-                        like_count = get_like_count(post["post_id"])
-                        liked = has_liked(post["post_id"], st.session_state.user)
-                        if st.button(f"{'❤️' if liked else '🤍'} 点赞 ({like_count})", key=f"like_{post['post_id']}"):
-                            toggle_like(post["post_id"], st.session_state.user)
-                            st.rerun()
-                    with col4:
-                        if post["nickname"] == st.session_state.user:
-                            if st.button("删除帖子", key=f"delete_post_{post['post_id']}"):
-                                # 删除帖子
-                                posts_df = load_data(POSTS_FILE)
-                                posts_df = posts_df[posts_df["post_id"] != post["post_id"]]
-                                save_data(posts_df, POSTS_FILE)
-                                
-                                # 删除相关评论
-                                comments_df = load_data(COMMENTS_FILE)
-                                comments_df = comments_df[comments_df["post_id"] != post["post_id"]]
-                                save_data(comments_df, COMMENTS_FILE)
-                                
-                                # 删除相关点赞
-                                likes_df = load_data(LIKES_FILE)
-                                likes_df = likes_df[likes_df["post_id"] != post["post_id"]]
-                                save_data(likes_df, LIKES_FILE)
-                                
-                                st.success("帖子已删除")
-                                st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 手风琴功能 - 折叠/展开评论
-                if f"expanded_{post['post_id']}" not in st.session_state:
-                    st.session_state[f"expanded_{post['post_id']}"] = False
-                
-                # 评论部分
-                st.markdown('<div class="comment-section">', unsafe_allow_html=True)
-                
-                # 加载评论数据
-                comments_df = load_data(COMMENTS_FILE)
-                post_comments = comments_df[comments_df["post_id"] == post["post_id"]]
-                comment_count = len(post_comments)
-                
-                # 显示评论标题和折叠/展开按钮（仅当有评论时显示按钮）
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown('<p style="font-size:16px; font-weight:bold;">评论:</p>', unsafe_allow_html=True)
-                with col2:
-                    if comment_count > 0:
-                        # 小按钮，显示评论总数
-                        toggle_key = f"toggle_comment_{post['post_id']}_{comment_count}"
-                        if st.button(f"{'展开' if not st.session_state[f'expanded_{post['post_id']}'] else '折叠'}({comment_count})", key=toggle_key, help="展开/折叠评论"):
-                            st.session_state[f"expanded_{post['post_id']}"] = not st.session_state[f"expanded_{post['post_id']}"]
-                
-                # 根据状态显示或隐藏评论
-                if st.session_state[f"expanded_{post['post_id']}"] or comment_count == 0:
-                    if not post_comments.empty:
-                        for idx, comment in post_comments.iterrows():
-                            # 稍透明的橙色卡片
-                            st.markdown('<div class="comment-card">', unsafe_allow_html=True)
-                            comment_role = get_user_role(comment["nickname"])
-                            role_suffix = "-家长" if comment_role == "parent" else "-孩子" if comment_role == "child" else ""
-                            st.markdown(f"<p style='color:black; font-weight:bold;'>{comment['nickname']}{role_suffix}</p>", unsafe_allow_html=True)
-                            st.markdown(f"<p style='font-weight:bold;'>{comment['content']}</p>", unsafe_allow_html=True)
-                            st.write(f"评论时间: {comment['created_at']}")
-                            
-                            # 删除评论功能
-                            if st.session_state.user and (comment["nickname"] == st.session_state.user):
-                                delete_key = f"delete_comment_{comment['comment_id']}_{idx}"
-                                if st.button(f"删除评论", key=delete_key):
-                                    comments_df = load_data(COMMENTS_FILE)
-                                    comments_df = comments_df[comments_df["comment_id"] != comment["comment_id"]]
-                                    save_data(comments_df, COMMENTS_FILE)
-                                    st.success("评论已删除")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                    else:
-                        st.write("暂无评论")
-                    
-                    # 评论输入
-                    if st.session_state.user:
-                        comment_key = f"comment_{post['post_id']}_{comment_count}"
-                        submit_key = f"submit_comment_{post['post_id']}_{comment_count}"
-                        comment_content = st.text_area("写下你的评论...", key=comment_key)
-                        if st.button("提交评论", key=submit_key):
-                            if comment_content:
-                                comments_df = load_data(COMMENTS_FILE)
-                                new_comment_id = len(comments_df) + 1
-                                new_comment = pd.DataFrame({
-                                    "comment_id": [new_comment_id],
-                                    "post_id": [post["post_id"]],
-                                    "nickname": [st.session_state.user],
-                                    "content": [comment_content],
-                                    "created_at": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                                })
-                                comments_df = pd.concat([comments_df, new_comment], ignore_index=True)
-                                save_data(comments_df, COMMENTS_FILE)
-                                st.success("发表成功！")
-                st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.write("暂无帖子，快来发布第一条吧！")
+        render_feed(data_store.feed_frame(), "", "暂无帖子，快来发布第一条吧！")
     
     # 我要发帖
     elif menu == "我要发帖":
@@ -472,16 +548,11 @@ def main_page():
             content = st.text_area("分享你的故事或感受...", height=200)
             if st.button("发布"):
                 if content:
-                    posts_df = load_data(POSTS_FILE)
-                    new_post_id = len(posts_df) + 1
-                    new_post = pd.DataFrame({
-                        "post_id": [new_post_id],
-                        "nickname": [st.session_state.user],
-                        "content": [content],
-                        "created_at": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+                    data_store.insert("posts", {
+                        "nickname": st.session_state.user,
+                        "content": content,
+                        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     })
-                    posts_df = pd.concat([posts_df, new_post], ignore_index=True)
-                    save_data(posts_df, POSTS_FILE)
                     st.success("发表成功！")
                 else:
                     st.warning("请输入内容")
@@ -493,272 +564,19 @@ def main_page():
         st.subheader("孩子的心声")
         
         # 显示孩子发布的帖子
-        posts_df = load_data(POSTS_FILE)
-        child_posts = []
-        for _, post in posts_df.iterrows():
-            if get_user_role(post["nickname"]) == "child":
-                child_posts.append(post)
-        
-        if child_posts:
-            # 按时间倒序排列
-            child_posts_df = pd.DataFrame(child_posts).sort_values("created_at", ascending=False)
-            
-            for _, post in child_posts_df.iterrows():
-                st.markdown("---")
-                
-                # 稍透明的蓝色卡片
-                st.markdown('<div class="post-section">', unsafe_allow_html=True)
-                
-                # 水平显示帖主信息
-                st.markdown('<div class="horizontal-user-info">', unsafe_allow_html=True)
-                avatar = get_user_avatar(post["nickname"])
-                if avatar and os.path.exists(f"avatars/{avatar}"):
-                    st.image(f"avatars/{avatar}", width=50)
-                role = get_user_role(post["nickname"])
-                role_suffix = "-家长" if role == "parent" else "-孩子" if role == "child" else ""
-                st.markdown(f"<p style='color:black; font-weight:bold;'>{post['nickname']}{role_suffix}</p>", unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 帖子内容
-                st.write(f"**{post['content']}**")
-                st.write(f"发布时间: {post['created_at']}")
-                
-                # 点赞和删除功能
-                if st.session_state.user:
-                    col3, col4 = st.columns([1, 1])
-                    with col3:
-                        like_count = get_like_count(post["post_id"])
-                        liked = has_liked(post["post_id"], st.session_state.user)
-                        if st.button(f"{'❤️' if liked else '🤍'} 点赞 ({like_count})", key=f"like_child_{post['post_id']}"):
-                            toggle_like(post["post_id"], st.session_state.user)
-                            st.rerun()
-                    with col4:
-                        if post["nickname"] == st.session_state.user:
-                            if st.button("删除帖子", key=f"delete_post_child_{post['post_id']}"):
-                                # 删除帖子
-                                posts_df = load_data(POSTS_FILE)
-                                posts_df = posts_df[posts_df["post_id"] != post["post_id"]]
-                                save_data(posts_df, POSTS_FILE)
-                                
-                                # 删除相关评论
-                                comments_df = load_data(COMMENTS_FILE)
-                                comments_df = comments_df[comments_df["post_id"] != post["post_id"]]
-                                save_data(comments_df, COMMENTS_FILE)
-                                
-                                # 删除相关点赞
-                                likes_df = load_data(LIKES_FILE)
-                                likes_df = likes_df[likes_df["post_id"] != post["post_id"]]
-                                save_data(likes_df, LIKES_FILE)
-                                
-                                st.success("帖子已删除")
-                                st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 手风琴功能 - 折叠/展开评论
-                if f"expanded_{post['post_id']}" not in st.session_state:
-                    st.session_state[f"expanded_{post['post_id']}"] = False
-                
-                # 评论部分
-                st.markdown('<div class="comment-section">', unsafe_allow_html=True)
-                
-                # 加载评论数据
-                comments_df = load_data(COMMENTS_FILE)
-                post_comments = comments_df[comments_df["post_id"] == post["post_id"]]
-                comment_count = len(post_comments)
-                
-                # 显示评论标题和折叠/展开按钮（仅当有评论时显示按钮）
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown('<p style="font-size:16px; font-weight:bold;">评论:</p>', unsafe_allow_html=True)
-                with col2:
-                    if comment_count > 0:
-                        # 小按钮，显示评论总数
-                        toggle_key = f"toggle_comment_child_{post['post_id']}_{comment_count}"
-                        if st.button(f"{'展开' if not st.session_state[f'expanded_{post['post_id']}'] else '折叠'}({comment_count})", key=toggle_key, help="展开/折叠评论"):
-                            st.session_state[f"expanded_{post['post_id']}"] = not st.session_state[f"expanded_{post['post_id']}"]
-                
-                # 根据状态显示或隐藏评论
-                if st.session_state[f"expanded_{post['post_id']}"] or comment_count == 0:
-                    if not post_comments.empty:
-                        for idx, comment in post_comments.iterrows():
-                            # 稍透明的橙色卡片
-                            st.markdown('<div class="comment-card">', unsafe_allow_html=True)
-                            comment_role = get_user_role(comment["nickname"])
-                            role_suffix = "-家长" if comment_role == "parent" else "-孩子" if comment_role == "child" else ""
-                            st.markdown(f"<p style='color:black; font-weight:bold;'>{comment['nickname']}{role_suffix}</p>", unsafe_allow_html=True)
-                            st.markdown(f"<p style='font-weight:bold;'>{comment['content']}</p>", unsafe_allow_html=True)
-                            st.write(f"评论时间: {comment['created_at']}")
-                            
-                            # 删除评论功能
-                            if st.session_state.user and (comment["nickname"] == st.session_state.user):
-                                delete_key = f"delete_comment_child_{comment['comment_id']}_{idx}"
-                                if st.button(f"删除评论", key=delete_key):
-                                    comments_df = load_data(COMMENTS_FILE)
-                                    comments_df = comments_df[comments_df["comment_id"] != comment["comment_id"]]
-                                    save_data(comments_df, COMMENTS_FILE)
-                                    st.success("评论已删除")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                    else:
-                        st.write("暂无评论")
-                    
-                    # 评论输入
-                    if st.session_state.user:
-                        comment_key = f"comment_child_{post['post_id']}_{comment_count}"
-                        submit_key = f"submit_comment_child_{post['post_id']}_{comment_count}"
-                        comment_content = st.text_area("写下你的评论...", key=comment_key)
-                        if st.button("提交评论", key=submit_key):
-                            if comment_content:
-                                comments_df = load_data(COMMENTS_FILE)
-                                new_comment_id = len(comments_df) + 1
-                                new_comment = pd.DataFrame({
-                                    "comment_id": [new_comment_id],
-                                    "post_id": [post["post_id"]],
-                                    "nickname": [st.session_state.user],
-                                    "content": [comment_content],
-                                    "created_at": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                                })
-                                comments_df = pd.concat([comments_df, new_comment], ignore_index=True)
-                                save_data(comments_df, COMMENTS_FILE)
-                                st.success("发表成功！")
-                st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.write("暂无孩子的帖子")
+        render_feed(data_store.feed_frame("child"), "child_", "暂无孩子的帖子")
     
     # 家长的困惑
     elif menu == "家长的困惑":
         st.subheader("家长的困惑")
         
         # 显示家长发布的帖子
-        posts_df = load_data(POSTS_FILE)
-        parent_posts = []
-        for _, post in posts_df.iterrows():
-            if get_user_role(post["nickname"]) == "parent":
-                parent_posts.append(post)
-        
-        if parent_posts:
-            # 按时间倒序排列
-            parent_posts_df = pd.DataFrame(parent_posts).sort_values("created_at", ascending=False)
-            
-            for _, post in parent_posts_df.iterrows():
-                st.markdown("---")
-                
-                # 稍透明的蓝色卡片
-                st.markdown('<div class="post-section">', unsafe_allow_html=True)
-                
-                # 水平显示帖主信息
-                st.markdown('<div class="horizontal-user-info">', unsafe_allow_html=True)
-                avatar = get_user_avatar(post["nickname"])
-                if avatar and os.path.exists(f"avatars/{avatar}"):
-                    st.image(f"avatars/{avatar}", width=50)
-                role = get_user_role(post["nickname"])
-                role_suffix = "-家长" if role == "parent" else "-孩子" if role == "child" else ""
-                st.markdown(f"<p style='color:black; font-weight:bold;'>{post['nickname']}{role_suffix}</p>", unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 帖子内容
-                st.write(f"**{post['content']}**")
-                st.write(f"发布时间: {post['created_at']}")
-                
-                # 点赞和删除功能
-                if st.session_state.user:
-                    col3, col4 = st.columns([1, 1])
-                    with col3:
-                        like_count = get_like_count(post["post_id"])
-                        liked = has_liked(post["post_id"], st.session_state.user)
-                        if st.button(f"{'❤️' if liked else '🤍'} 点赞 ({like_count})", key=f"like_parent_{post['post_id']}"):
-                            toggle_like(post["post_id"], st.session_state.user)
-                            st.rerun()
-                    with col4:
-                        if post["nickname"] == st.session_state.user:
-                            if st.button("删除帖子", key=f"delete_post_parent_{post['post_id']}"):
-                                # 删除帖子
-                                posts_df = load_data(POSTS_FILE)
-                                posts_df = posts_df[posts_df["post_id"] != post["post_id"]]
-                                save_data(posts_df, POSTS_FILE)
-                                
-                                # 删除相关评论
-                                comments_df = load_data(COMMENTS_FILE)
-                                comments_df = comments_df[comments_df["post_id"] != post["post_id"]]
-                                save_data(comments_df, COMMENTS_FILE)
-                                
-                                # 删除相关点赞
-                                likes_df = load_data(LIKES_FILE)
-                                likes_df = likes_df[likes_df["post_id"] != post["post_id"]]
-                                save_data(likes_df, LIKES_FILE)
-                                
-                                st.success("帖子已删除")
-                                st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 手风琴功能 - 折叠/展开评论
-                if f"expanded_{post['post_id']}" not in st.session_state:
-                    st.session_state[f"expanded_{post['post_id']}"] = False
-                
-                # 评论部分
-                st.markdown('<div class="comment-section">', unsafe_allow_html=True)
-                
-                # 加载评论数据
-                comments_df = load_data(COMMENTS_FILE)
-                post_comments = comments_df[comments_df["post_id"] == post["post_id"]]
-                comment_count = len(post_comments)
-                
-                # 显示评论标题和折叠/展开按钮（仅当有评论时显示按钮）
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown('<p style="font-size:16px; font-weight:bold;">评论:</p>', unsafe_allow_html=True)
-                with col2:
-                    if comment_count > 0:
-                        # 小按钮，显示评论总数
-                        toggle_key = f"toggle_comment_parent_{post['post_id']}_{comment_count}"
-                        if st.button(f"{'展开' if not st.session_state[f'expanded_{post['post_id']}'] else '折叠'}({comment_count})", key=toggle_key, help="展开/折叠评论"):
-                            st.session_state[f"expanded_{post['post_id']}"] = not st.session_state[f"expanded_{post['post_id']}"]
-                
-                # 根据状态显示或隐藏评论
-                if st.session_state[f"expanded_{post['post_id']}"] or comment_count == 0:
-                    if not post_comments.empty:
-                        for idx, comment in post_comments.iterrows():
-                            # 稍透明的橙色卡片
-                            st.markdown('<div class="comment-card">', unsafe_allow_html=True)
-                            comment_role = get_user_role(comment["nickname"])
-                            role_suffix = "-家长" if comment_role == "parent" else "-孩子" if comment_role == "child" else ""
-                            st.markdown(f"<p style='color:black; font-weight:bold;'>{comment['nickname']}{role_suffix}</p>", unsafe_allow_html=True)
-                            st.markdown(f"<p style='font-weight:bold;'>{comment['content']}</p>", unsafe_allow_html=True)
-                            st.write(f"评论时间: {comment['created_at']}")
-                            
-                            # 删除评论功能
-                            if st.session_state.user and (comment["nickname"] == st.session_state.user):
-                                delete_key = f"delete_comment_parent_{comment['comment_id']}_{idx}"
-                                if st.button(f"删除评论", key=delete_key):
-                                    comments_df = load_data(COMMENTS_FILE)
-                                    comments_df = comments_df[comments_df["comment_id"] != comment["comment_id"]]
-                                    save_data(comments_df, COMMENTS_FILE)
-                                    st.success("评论已删除")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                    else:
-                        st.write("暂无评论")
-                    
-                    # 评论输入
-                    if st.session_state.user:
-                        comment_key = f"comment_parent_{post['post_id']}_{comment_count}"
-                        submit_key = f"submit_comment_parent_{post['post_id']}_{comment_count}"
-                        comment_content = st.text_area("写下你的评论...", key=comment_key)
-                        if st.button("提交评论", key=submit_key):
-                            if comment_content:
-                                comments_df = load_data(COMMENTS_FILE)
-                                new_comment_id = len(comments_df) + 1
-                                new_comment = pd.DataFrame({
-                                    "comment_id": [new_comment_id],
-                                    "post_id": [post["post_id"]],
-                                    "nickname": [st.session_state.user],
-                                    "content": [comment_content],
-                                    "created_at": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                                })
-                                comments_df = pd.concat([comments_df, new_comment], ignore_index=True)
-                                save_data(comments_df, COMMENTS_FILE)
-                                st.success("发表成功！")
-                st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.write("暂无家长的帖子")
+        render_feed(data_store.feed_frame("parent"), "parent_", "暂无家长的帖子")
+    
+    # 搜索
+    elif menu == "搜索":
+        st.subheader("搜索")
+        render_search()
     
     # 申请管理员
     elif menu == "申请管理员":
@@ -797,26 +615,21 @@ def main_page():
             elif password != confirm_password:
                 st.warning("两次输入的密码不一致")
             else:
-                # 处理头像
+                # 处理头像：按内容哈希保存，缩略图在后台生成
                 avatar_filename = None
                 if avatar:
-                    avatar_filename = f"{nickname}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{avatar.name.split('.')[-1]}"
-                    with open(f"avatars/{avatar_filename}", "wb") as f:
-                        f.write(avatar.getbuffer())
+                    avatar_filename = avatars.store_avatar(avatar, avatar.name, "avatars")
                 
                 # 保存用户信息
-                users_df = load_data(USERS_FILE)
-                new_user = pd.DataFrame({
-                    "nickname": [nickname],
-                    "password": [hash_password(password)],
-                    "role": ["parent" if role == "家长" else "child"],
-                    "avatar": [avatar_filename],
-                    "is_admin": [False]
+                data_store.insert("users", {
+                    "nickname": nickname,
+                    "password": hash_password(password),
+                    "role": "parent" if role == "家长" else "child",
+                    "avatar": avatar_filename,
+                    "is_admin": 0
                 })
-                users_df = pd.concat([users_df, new_user], ignore_index=True)
-                save_data(users_df, USERS_FILE)
                 
-                st.success("注册成功！")
+                flash("注册成功！")
                 st.session_state.user = nickname
                 st.rerun()
     
@@ -830,7 +643,7 @@ def main_page():
         if st.button("登录"):
             if verify_login(nickname, password):
                 st.session_state.user = nickname
-                st.success("登录成功！")
+                flash("登录成功！")
                 st.rerun()
             else:
                 st.error("昵称或密码错误")
@@ -842,15 +655,13 @@ def main_page():
             
             # 统计数据
             st.write("## 统计数据")
-            users_df = load_data(USERS_FILE)
-            posts_df = load_data(POSTS_FILE)
-            comments_df = load_data(COMMENTS_FILE)
-            
-            likes_df = load_data(LIKES_FILE)
-            st.write(f"总用户数: {len(users_df)}")
-            st.write(f"总帖子数: {len(posts_df)}")
-            st.write(f"总评论数: {len(comments_df)}")
-            st.write(f"总点赞数: {len(likes_df)}")
+            # 计数器随写入维护，一次查询读出，不再加载整表
+            stats = data_store.stats()
+            roles = stats["users_by_role"]
+            st.write(f"总用户数: {stats['users']}（家长 {roles.get('parent', 0)} / 孩子 {roles.get('child', 0)}）")
+            st.write(f"总帖子数: {stats['posts']}")
+            st.write(f"总评论数: {stats['comments']}")
+            st.write(f"总点赞数: {stats['likes']}")
             
             # 处理管理员申请
             st.write("## 管理员申请管理")
@@ -867,55 +678,23 @@ def main_page():
                     with col1:
                         if st.button(f"批准申请 {request['request_id']}", key=f"approve_{request['request_id']}"):
                             process_admin_request(request['request_id'], "approved")
-                            st.success("申请已批准")
+                            flash("申请已批准")
                             st.rerun()
                     with col2:
                         if st.button(f"拒绝申请 {request['request_id']}", key=f"reject_{request['request_id']}"):
                             process_admin_request(request['request_id'], "rejected")
-                            st.success("申请已拒绝")
+                            flash("申请已拒绝")
                             st.rerun()
             else:
                 st.write("暂无待处理的管理员申请")
-        
-        # 管理帖子
-        st.write("## 管理帖子")
-        if not posts_df.empty:
-            for _, post in posts_df.iterrows():
-                st.markdown("---")
-                st.write(f"**帖子ID: {post['post_id']}**")
-                st.write(f"发布人: {post['nickname']}")
-                st.write(f"内容: {post['content']}")
-                st.write(f"发布时间: {post['created_at']}")
-                if st.button(f"删除帖子 {post['post_id']}", key=f"delete_post_{post['post_id']}"):
-                    # 删除帖子
-                    posts_df = posts_df[posts_df["post_id"] != post["post_id"]]
-                    save_data(posts_df, POSTS_FILE)
-                    
-                    # 删除相关评论
-                    comments_df = comments_df[comments_df["post_id"] != post["post_id"]]
-                    save_data(comments_df, COMMENTS_FILE)
-                    
-                    st.success("帖子已删除")
-                    st.rerun()
-        else:
-            st.write("暂无帖子")
-        
-        # 管理评论
-        st.write("## 管理评论")
-        if not comments_df.empty:
-            for _, comment in comments_df.iterrows():
-                st.markdown("---")
-                st.write(f"**评论ID: {comment['comment_id']}**")
-                st.write(f"评论人: {comment['nickname']}")
-                st.write(f"内容: {comment['content']}")
-                st.write(f"评论时间: {comment['created_at']}")
-                if st.button(f"删除评论 {comment['comment_id']}", key=f"delete_comment_{comment['comment_id']}"):
-                    comments_df = comments_df[comments_df["comment_id"] != comment["comment_id"]]
-                    save_data(comments_df, COMMENTS_FILE)
-                    st.success("评论已删除")
-                    st.rerun()
-        else:
-            st.write("暂无评论")
+            
+            # 管理帖子（删除时一并删除相关评论和点赞）
+            st.write("## 管理帖子")
+            render_moderation("posts", "帖子")
+            
+            # 管理评论
+            st.write("## 管理评论")
+            render_moderation("comments", "评论")
 
 # 初始化数据文件
 init_data_files()
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from flask import abort, current_app, redirect, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+# brotli 为可选依赖，没有安装时只预压缩 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 需要预压缩的文本类静态文件
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+
+# 带内容指纹的静态资源：URL 形如 /assets/<指纹>/<文件名>，
+# 文件内容变化后指纹随之变化，因此可以用长期的 immutable 缓存
+class StaticAssets:
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.max_age = 365 * 24 * 3600
+        self._fingerprints = {}
+        self._compressed = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.max_age = app.config.get('ASSET_MAX_AGE', self.max_age)
+        app.add_url_rule('/assets/<fingerprint>/<path:filename>', 'assets', self.serve)
+        app.add_template_global(self.asset_url)
+        self.precompress_all()
+
+    # 文件内容指纹，按修改时间和大小缓存，文件不变时不重复计算；文件不存在时返回 None
+    def fingerprint(self, filename):
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._fingerprints.get(filename)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:12]
+        with self._lock:
+            self._fingerprints[filename] = (key, fingerprint)
+        return fingerprint
+
+    # 模板中使用的静态资源地址，文件不存在时退回普通的 static 地址
+    def asset_url(self, filename):
+        fingerprint = self.fingerprint(filename)
+        if fingerprint is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', fingerprint=fingerprint, filename=filename)
+
+    # 启动时预压缩所有文本类静态文件
+    def precompress_all(self):
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                    filename = os.path.relpath(os.path.join(root, name), self.static_folder).replace(os.sep, '/')
+                    self._compressed_variants(filename, self.fingerprint(filename))
+
+    # 某个指纹版本的 gzip/brotli 压缩结果 {编码: 数据}，只计算一次
+    def _compressed_variants(self, filename, fingerprint):
+        key = (filename, fingerprint)
+        with self._lock:
+            variants = self._compressed.get(key)
+        if variants is not None:
+            return variants
+        with open(safe_join(self.static_folder, filename), 'rb') as f:
+            data = f.read()
+        variants = {'gzip': gzip.compress(data, compresslevel=9)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        with self._lock:
+            self._compressed[key] = variants
+        return variants
+
+    def serve(self, fingerprint, filename):
+        current = self.fingerprint(filename)
+        if current is None:
+            abort(404)
+        # 旧指纹：跳转到当前版本
+        if current != fingerprint:
+            return redirect(url_for('assets', fingerprint=current, filename=filename))
+        response = None
+        if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+            variants = self._compressed_variants(filename, current)
+            for encoding in ('br', 'gzip'):
+                if encoding in variants and encoding in request.accept_encodings:
+                    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                    response = current_app.response_class(variants[encoding], mimetype=mimetype)
+                    response.headers['Content-Encoding'] = encoding
+                    break
+        if response is None:
+            response = send_from_directory(self.static_folder, filename, conditional=False, etag=False)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        response.set_etag(current)
+        return response
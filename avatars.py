@@ -0,0 +1,127 @@
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Pillow 为可选依赖，没有安装时不生成缩略图，页面直接使用原图
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 缩略图边长（像素），页面按显示尺寸的两倍选择最接近的一档
+THUMBNAIL_SIZES = (64, 128)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+CHUNK_SIZE = 64 * 1024
+
+# 后台缩略图线程，上传请求不等待缩放完成
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatar-thumbnails')
+_pending = set()
+_ready = set()
+_failed = set()
+_lock = threading.Lock()
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+# 把上传的文件流分块写入磁盘，按内容哈希命名（相同图片只存一份），返回文件名
+def store_avatar(stream, filename, folder):
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'png'
+    if ext == 'jpeg':
+        ext = 'jpg'
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+        name = f"{digest.hexdigest()[:16]}.{ext}"
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    schedule_thumbnails(folder, name)
+    return name
+
+def thumbnail_name(name, size):
+    return f"{os.path.splitext(name)[0]}_{size}.png"
+
+# 在后台线程中生成各档缩略图（已生成或正在生成的跳过）
+def schedule_thumbnails(folder, name):
+    if Image is None:
+        return
+    key = (folder, name)
+    with _lock:
+        if key in _pending or key in _ready or key in _failed:
+            return
+        _pending.add(key)
+    _executor.submit(_make_thumbnails, folder, name)
+
+def _make_thumbnails(folder, name):
+    try:
+        with Image.open(os.path.join(folder, name)) as image:
+            image = image.convert('RGBA')
+            # 居中裁成正方形再缩放
+            side = min(image.size)
+            left = (image.width - side) // 2
+            top = (image.height - side) // 2
+            square = image.crop((left, top, left + side, top + side))
+            for size in THUMBNAIL_SIZES:
+                target = os.path.join(folder, thumbnail_name(name, size))
+                if not os.path.exists(target):
+                    thumb = square.resize((size, size), Image.LANCZOS)
+                    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.png')
+                    with os.fdopen(fd, 'wb') as tmp:
+                        thumb.save(tmp, 'PNG', optimize=True)
+                    os.replace(tmp_path, target)
+        with _lock:
+            _ready.add((folder, name))
+    except (OSError, ValueError):
+        # 文件缺失或不是有效图片时保留原图，不再重试
+        with _lock:
+            _failed.add((folder, name))
+    finally:
+        with _lock:
+            _pending.discard((folder, name))
+
+# 缩略图是否已生成（已记录，或磁盘上已有最大一档）
+def _thumbnails_ready(folder, name):
+    with _lock:
+        if (folder, name) in _ready:
+            return True
+    if os.path.exists(os.path.join(folder, thumbnail_name(name, THUMBNAIL_SIZES[-1]))):
+        with _lock:
+            _ready.add((folder, name))
+        return True
+    return False
+
+# 头像地址是否已经确定：不生成缩略图、缩略图已生成、生成失败或原图不存在时为 True；
+# 为 False 时 avatar_file 返回的原图只是缩略图生成前的临时替代，不应被缓存
+def avatar_settled(folder, name):
+    if Image is None or not name or _thumbnails_ready(folder, name):
+        return True
+    with _lock:
+        if (folder, name) in _failed:
+            return True
+    return not os.path.exists(os.path.join(folder, name))
+
+# 返回适合显示尺寸的头像文件名；缩略图还没生成时返回原图并安排后台生成
+def avatar_file(folder, name, display_size):
+    if Image is None or not name:
+        return name
+    size = next((size for size in THUMBNAIL_SIZES if size >= display_size * 2), THUMBNAIL_SIZES[-1])
+    if _thumbnails_ready(folder, name):
+        return thumbnail_name(name, size)
+    if os.path.exists(os.path.join(folder, name)):
+        schedule_thumbnails(folder, name)
+    return name
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic_data
+
+# 进程内压测：用合成数据填充临时数据库，驱动 Flask 的 home / post / add_comment / login
+# 和 Streamlit 的页面渲染，统计 p50/p95/p99 延迟和吞吐量，结果保存为 JSON 便于对比回归
+# 例如：python benchmarks/bench_load.py --posts 20000 --compare benchmarks/results/上一次.json
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+def percentile(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+# 执行 warmup 次预热后计时 iterations 次，call 接收迭代序号
+def measure(name, call, iterations, warmup=3):
+    for i in range(warmup):
+        call(i)
+    timings = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        call(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "max_ms": round(timings[-1], 2),
+        "throughput_rps": round(iterations / elapsed, 1),
+    }
+    print(f"{name:<24} p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+          f"p99 {result['p99_ms']:>8.2f} ms  {result['throughput_rps']:>8.1f} 次/秒")
+    return result
+
+# 按热度抽样帖子 id，与合成数据的评论分布一致
+def popular_post_ids(data, count, seed):
+    rng = random.Random(seed)
+    post_ids = [comment["post_id"] for comment in data["comments"]] or [post["id"] for post in data["posts"]]
+    return [rng.choice(post_ids) for _ in range(count)]
+
+def bench_flask(data, tmp, args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'flask.db')}"
+    from app import app
+    from extensions import db
+    from migrations import upgrade
+
+    with app.app_context():
+        db.create_all()
+        upgrade()
+        synthetic_data.fill_flask(data)
+
+    anonymous = app.test_client()
+    client = app.test_client()
+    nickname = data["users"][0]["nickname"]
+    client.post("/login", data={"nickname": nickname, "password": synthetic_data.PASSWORD})
+    post_ids = popular_post_ids(data, args.requests + 10, args.seed)
+
+    def check(response, status=200):
+        if response.status_code != status:
+            raise RuntimeError(f"{response.request.path} 返回 {response.status_code}")
+
+    return [
+        measure("flask home (匿名)", lambda i: check(anonymous.get("/")), args.requests),
+        measure("flask home (登录)", lambda i: check(client.get("/")), args.requests),
+        measure("flask post", lambda i: check(client.get(f"/post/{post_ids[i]}")), args.requests),
+        measure("flask add_comment", lambda i: check(client.post(
+            f"/post/{post_ids[i]}/comment", data={"content": f"压测评论 {i}"}), 302), args.requests),
+        # 登录的耗时主要是密码哈希，次数少一些
+        measure("flask login", lambda i: check(app.test_client().post(
+            "/login", data={"nickname": nickname, "password": synthetic_data.PASSWORD}), 302),
+            max(5, args.requests // 20), warmup=1),
+    ]
+
+# Streamlit 页面渲染：用 AppTest 在进程内执行 app2.py，每次 run() 是一次完整的页面渲染
+def bench_streamlit(data, tmp, args):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("未安装 streamlit，跳过 Streamlit 压测")
+        return []
+    import data_store
+
+    # app2.py 在当前目录下创建 data/ 和 avatars/，切到临时目录运行
+    os.chdir(tmp)
+    data_store.DB_FILE = os.path.join(tmp, "streamlit.db")
+    data_store.init_db()
+    synthetic_data.fill_data_store(data)
+    admin = data["users"][0]["nickname"]
+
+    def page(menu, user=None):
+        at = AppTest.from_file(os.path.join(ROOT, "app2.py"), default_timeout=60)
+        at.session_state.user = user
+        at.run()
+        if menu is not None:
+            at.radio[0].set_value(menu)
+
+        def render(i):
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception)
+        return render
+
+    iterations = max(5, args.requests // 10)
+    return [
+        measure("streamlit 首页", page(None), iterations),
+        measure("streamlit 孩子的心声", page("孩子的心声", admin), iterations),
+        measure("streamlit 后台管理", page("后台管理", admin), iterations),
+    ]
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# 与之前保存的结果对比 p95 和吞吐量
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+    print(f"\n与 {baseline_path} 对比（p95 / 吞吐量变化）")
+    for result in results:
+        old = baseline.get(result["name"])
+        if old is None:
+            continue
+        p95 = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0
+        rps = (result["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100 if old["throughput_rps"] else 0
+        print(f"{result['name']:<24} p95 {p95:>+7.1f}%  吞吐量 {rps:>+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Flask / Streamlit 进程内压测")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--likes", type=int, default=20000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求次数")
+    parser.add_argument("--only", choices=["flask", "streamlit"])
+    parser.add_argument("--output", help="结果文件，默认保存到 benchmarks/results/")
+    parser.add_argument("--compare", help="与之前保存的结果文件对比")
+    args = parser.parse_args()
+
+    data = synthetic_data.generate(args.users, args.posts, args.comments, args.likes, args.skew, seed=args.seed)
+    print(f"数据规模：{len(data['users'])} 用户 / {len(data['posts'])} 帖子 / "
+          f"{len(data['comments'])} 评论 / {len(data['likes'])} 点赞")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        try:
+            if args.only != "streamlit":
+                results += bench_flask(data, tmp, args)
+            if args.only != "flask":
+                results += bench_streamlit(data, tmp, args)
+        finally:
+            os.chdir(cwd)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_store
+
+# 动态渲染一页帖子流时，每个帖子需要查一次作者头像和角色
+POSTS_PER_PAGE = 50
+USER_COUNTS = [100, 1000, 10000, 100000]
+REPEAT = 5
+
+# 旧实现：每次查询都对整张用户表做布尔掩码扫描
+def render_with_scan(users_df, authors):
+    for nickname in authors:
+        user = users_df[users_df["nickname"] == nickname]
+        if not user.empty:
+            user.iloc[0]["avatar"]
+        user = users_df[users_df["nickname"] == nickname]
+        if not user.empty:
+            user.iloc[0]["role"]
+
+# 新实现：按昵称查用户索引
+def render_with_index(authors):
+    for nickname in authors:
+        data_store.user_index().get(nickname)
+        data_store.user_index().get(nickname)
+
+def best_of(func, *args):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        data_store.DB_FILE = os.path.join(tmp, "bench.db")
+        data_store.init_db()
+        print(f"{'用户数':>8} {'全表扫描(ms)':>14} {'用户索引(ms)':>14}")
+        inserted = 0
+        for count in USER_COUNTS:
+            with data_store.transaction():
+                for i in range(inserted, count):
+                    data_store.insert("users", {
+                        "nickname": f"user{i}",
+                        "password": "x",
+                        "role": "parent" if i % 2 else "child",
+                        "avatar": f"user{i}.png",
+                        "is_admin": 0
+                    })
+            inserted = count
+            authors = [f"user{i * count // POSTS_PER_PAGE}" for i in range(POSTS_PER_PAGE)]
+            users_df = data_store.load_table("users")
+            data_store.user_index()
+            scan_ms = best_of(render_with_scan, users_df, authors)
+            index_ms = best_of(render_with_index, authors)
+            print(f"{count:>8} {scan_ms:>14.2f} {index_ms:>14.2f}")
+
+if __name__ == "__main__":
+    main()
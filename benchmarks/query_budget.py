@@ -0,0 +1,175 @@
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic_data
+
+# 路由查询预算检查：用固定的合成数据集建临时数据库，逐个请求路由，
+# 统计每个请求执行的 SQL 条数和从数据库取回的行数（在游标层统计，列查询、聚合查询也计入），
+# 超出预算时打印与基线快照相比的 SQL 差异并以状态码 1 退出。
+# 新增延迟加载（N+1）会增加语句数，不带 LIMIT 的查询会使取回的行数随数据量膨胀。
+#   python benchmarks/query_budget.py            检查
+#   python benchmarks/query_budget.py --update   改动确认无误后更新基线快照
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "query_budget_baseline.json")
+
+# 固定数据集：热门帖子的评论数超过一页，用户数大于首页帖子数，未加分页的查询会明显超出预算
+DATASET = {"users": 30, "posts": 120, "comments": 400, "likes": 0, "skew": 1.1, "seed": 7}
+
+# 每个路由的预算：(最多 SQL 条数, 最多取回行数)
+BUDGETS = {
+    "home (匿名)": (3, 25),  # 一页 20 篇帖子（作者在同一行中连接）
+    "home (登录)": (3, 25),
+    "post": (4, 60),  # 帖子和一页评论
+    "admin": (3, 10),  # 当前用户和固定的几个统计计数器
+    "add_comment": (8, 5),
+    "delete_post": (10, 5),  # 评论按帖子批量删除，不取回评论
+}
+
+# 同类语句归一化：合并空白，IN 列表的参数个数不计入差异
+def normalize(statement):
+    statement = " ".join(statement.split())
+    return re.sub(r"\((?:\?, )+\?\)", "(?, ...)", statement)
+
+# 统计取回行数的游标代理：查询结果从这里取行，ORM 对象、列查询、聚合查询都会计入
+class CountingCursor:
+    def __init__(self, cursor, capture):
+        self._cursor = cursor
+        self._capture = capture
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._capture.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._capture.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._capture.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._capture.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+# 在请求期间记录 SQL 语句和从数据库取回的行数：
+# 语句执行后把执行上下文的游标换成 CountingCursor，之后构造的结果集都从代理取行
+class Capture:
+    def __init__(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        self.active = False
+        self.statements = []
+        self.rows = 0
+        event.listen(Engine, "after_cursor_execute", self._statement)
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append(normalize(statement))
+            if context is not None and cursor.description is not None:
+                context.cursor = CountingCursor(cursor, self)
+
+    def run(self, request):
+        self.statements, self.rows, self.active = [], 0, True
+        try:
+            response = request()
+        finally:
+            self.active = False
+        return response
+
+def check_routes():
+    from app import app
+    from extensions import db, fragment_cache, user_cache
+    from migrations import upgrade
+    from models import Post
+
+    data = synthetic_data.generate(DATASET["users"], DATASET["posts"], DATASET["comments"],
+                                   DATASET["likes"], DATASET["skew"], seed=DATASET["seed"])
+    with app.app_context():
+        db.create_all()
+        upgrade()
+        synthetic_data.fill_flask(data)
+        popular = db.session.query(Post.id).order_by(Post.comment_count.desc(), Post.id).first()[0]
+        quiet = db.session.query(Post.id).filter(Post.id != popular).order_by(Post.comment_count.desc(), Post.id).first()[0]
+
+    anonymous = app.test_client()
+    client = app.test_client()
+    client.post("/login", data={"nickname": data["users"][0]["nickname"], "password": synthetic_data.PASSWORD})
+    capture = Capture()
+
+    # 每个请求前清空进程内缓存，统计的是缓存未命中时的查询
+    def fresh(request):
+        def run():
+            user_cache.clear()
+            fragment_cache.clear()
+            return request()
+        return run
+
+    scenarios = [
+        ("home (匿名)", lambda: anonymous.get("/")),
+        ("home (登录)", lambda: client.get("/")),
+        ("post", lambda: client.get(f"/post/{popular}")),
+        ("admin", lambda: client.get("/admin")),
+        ("add_comment", lambda: client.post(f"/post/{popular}/comment", data={"content": "预算检查"})),
+        ("delete_post", lambda: client.get(f"/admin/delete_post/{quiet}")),
+    ]
+    results = {}
+    for name, request in scenarios:
+        response = capture.run(fresh(request))
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} 返回 {response.status_code}")
+        results[name] = {"statements": capture.statements, "rows": capture.rows}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="检查各路由的 SQL 条数和取回行数预算")
+    parser.add_argument("--update", action="store_true", help="把本次捕获的语句写入基线快照")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'budget.db')}"
+        os.environ.pop("SQLITE_READ_POOL_SIZE", None)
+        results = check_routes()
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    failed = False
+    for name, result in results.items():
+        max_statements, max_rows = BUDGETS[name]
+        count, rows = len(result["statements"]), result["rows"]
+        over = count > max_statements or rows > max_rows
+        failed = failed or over
+        print(f"{'✗' if over else '✓'} {name:<14} SQL {count:>3} / {max_statements:<3} 取回行数 {rows:>4} / {max_rows}")
+        if over:
+            expected = baseline.get(name, {}).get("statements", [])
+            for line in difflib.unified_diff(expected, result["statements"], "基线", "本次", lineterm=""):
+                print(f"    {line}")
+
+    if args.update:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线快照已更新：{BASELINE_FILE}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import credentials
+
+# 合成数据生成器：按配置的规模生成用户、帖子、评论、点赞，
+# 帖子热度和用户活跃度服从幂律分布（少数帖子获得大部分评论和点赞），
+# 可以写入 Flask 的 SQLAlchemy 模型（site.db）或 Streamlit 的 data_store（data/app.db）
+
+# 所有合成用户的密码，登录压测时使用
+PASSWORD = "password"
+
+PHRASES = [
+    "今天孩子放学回家", "作业写到很晚", "不想去上补习班", "周末一起去公园", "妈妈总是唠叨",
+    "考试没考好", "想养一只小狗", "和同学闹别扭了", "爸爸工作太忙", "手机玩得太多",
+    "晚饭吃什么", "青春期的孩子", "怎么和孩子沟通", "学钢琴坚持不下去", "睡前故事",
+    "老师打电话来", "第一次自己坐公交", "零花钱怎么给", "暑假计划", "谢谢你一直陪着我",
+]
+
+def sentence(rng, min_phrases=1, max_phrases=6):
+    return "，".join(rng.choice(PHRASES) for _ in range(rng.randint(min_phrases, max_phrases))) + "。"
+
+# 幂律权重：第 k 个元素的权重为 1 / k^skew，顺序先打乱，热门对象与 id 无关
+def skewed_weights(count, skew, rng):
+    weights = [1 / (rank ** skew) for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+# 生成数据集，返回 {'users': [...], 'posts': [...], 'comments': [...], 'likes': [...]}；
+# 帖子、评论用从 1 开始的 id 互相引用，用户用昵称引用
+def generate(users=100, posts=1000, comments=5000, likes=5000, skew=1.1, days=365, seed=42):
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    password_hash = credentials.hash_password(PASSWORD)
+
+    user_rows = [{
+        "nickname": f"user{i}",
+        "password": password_hash,
+        "role": "parent" if rng.random() < 0.5 else "child",
+        "is_admin": i == 0,
+    } for i in range(users)]
+    nicknames = [user["nickname"] for user in user_rows]
+    activity = skewed_weights(users, skew, rng)
+
+    authors = rng.choices(nicknames, cum_weights=activity, k=posts)
+    post_times = sorted(now - timedelta(seconds=rng.randint(0, days * 86400)) for _ in range(posts))
+    post_rows = [{
+        "id": i + 1,
+        "nickname": authors[i],
+        "title": rng.choice(PHRASES),
+        "content": sentence(rng, 2, 12),
+        "created_at": post_times[i],
+    } for i in range(posts)]
+
+    popularity = skewed_weights(posts, skew, rng)
+    commented = rng.choices(range(posts), cum_weights=popularity, k=comments)
+    commenters = rng.choices(nicknames, cum_weights=activity, k=comments)
+    comment_rows = []
+    for i, (post_index, nickname) in enumerate(zip(commented, commenters)):
+        posted = post_rows[post_index]["created_at"]
+        comment_rows.append({
+            "id": i + 1,
+            "post_id": post_index + 1,
+            "nickname": nickname,
+            "content": sentence(rng),
+            "created_at": min(now, posted + timedelta(seconds=rng.randint(60, 7 * 86400))),
+        })
+
+    # 每个用户对每个帖子只能点赞一次，重复的抽样丢弃
+    like_rows = []
+    seen = set()
+    liked = rng.choices(range(posts), cum_weights=popularity, k=likes)
+    likers = rng.choices(nicknames, k=likes)
+    for post_index, nickname in zip(liked, likers):
+        if (post_index, nickname) in seen:
+            continue
+        seen.add((post_index, nickname))
+        like_rows.append({
+            "post_id": post_index + 1,
+            "nickname": nickname,
+            "created_at": post_rows[post_index]["created_at"] + timedelta(hours=1),
+        })
+
+    return {"users": user_rows, "posts": post_rows, "comments": comment_rows, "likes": like_rows}
+
+# 写入 Flask 应用的数据库（需要在 app_context 中调用，表已由 db.create_all / upgrade 建好）；
+# 批量插入不经过 ORM flush，评论数和统计计数器在插入后统一计算
+def fill_flask(data):
+    from extensions import db
+    from models import User, Post, Comment, rebuild_stats
+
+    user_ids = {}
+    db.session.execute(db.insert(User), [{
+        "nickname": user["nickname"],
+        "password": user["password"],
+        "role": user["role"],
+        "is_developer": user["is_admin"],
+    } for user in data["users"]])
+    for user_id, nickname in db.session.query(User.id, User.nickname):
+        user_ids[nickname] = user_id
+
+    comment_counts = {}
+    for comment in data["comments"]:
+        comment_counts[comment["post_id"]] = comment_counts.get(comment["post_id"], 0) + 1
+    db.session.execute(db.insert(Post), [{
+        "id": post["id"],
+        "title": post["title"],
+        "content": post["content"],
+        "date_posted": post["created_at"],
+        "user_id": user_ids[post["nickname"]],
+        "comment_count": comment_counts.get(post["id"], 0),
+    } for post in data["posts"]])
+    db.session.execute(db.insert(Comment), [{
+        "id": comment["id"],
+        "content": comment["content"],
+        "date_posted": comment["created_at"],
+        "user_id": user_ids[comment["nickname"]],
+        "post_id": comment["post_id"],
+    } for comment in data["comments"]])
+    db.session.commit()
+    rebuild_stats()
+
+# 写入 Streamlit 应用的 data_store（data_store.DB_FILE 指向的数据库，需已 init_db）
+def fill_data_store(data):
+    import pandas as pd
+    import data_store
+
+    def frame(rows, columns):
+        df = pd.DataFrame(rows, columns=columns)
+        if "created_at" in df.columns:
+            df["created_at"] = df["created_at"].map(lambda value: value.strftime("%Y-%m-%d %H:%M:%S"))
+        return df
+
+    users = frame(data["users"], ["nickname", "password", "role", "is_admin"])
+    users["is_admin"] = users["is_admin"].astype(int)
+    posts = frame(data["posts"], ["id", "nickname", "content", "created_at"]).rename(columns={"id": "post_id"})
+    comments = frame(data["comments"], ["id", "post_id", "nickname", "content", "created_at"]).rename(columns={"id": "comment_id"})
+    likes = frame(data["likes"], ["post_id", "nickname", "created_at"])
+    with data_store.transaction():
+        for df, table in ((users, "users"), (posts, "posts"), (comments, "comments"), (likes, "likes")):
+            data_store.replace_table(df, table)
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成数据")
+    parser.add_argument("target", choices=["flask", "streamlit"], help="写入 Flask 的 site.db 或 Streamlit 的 data/app.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--likes", type=int, default=50000)
+    parser.add_argument("--skew", type=float, default=1.1, help="热度幂律指数，越大越集中")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="数据库文件，默认为应用自己的数据库")
+    args = parser.parse_args()
+
+    data = generate(args.users, args.posts, args.comments, args.likes, args.skew, seed=args.seed)
+    if args.target == "flask":
+        if args.db:
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+        from app import app
+        from extensions import db
+        from migrations import upgrade
+        from models import User
+        with app.app_context():
+            db.create_all()
+            upgrade()
+            if User.query.first() is not None:
+                sys.exit("目标数据库中已有用户，请指定一个新的 --db 文件")
+            fill_flask(data)
+    else:
+        import data_store
+        if args.db:
+            data_store.DB_FILE = args.db
+        os.makedirs(os.path.dirname(os.path.abspath(data_store.DB_FILE)), exist_ok=True)
+        data_store.init_db()
+        if data_store.stats()["users"]:
+            sys.exit("目标数据库中已有用户，请指定一个新的 --db 文件")
+        fill_data_store(data)
+    print(f"已写入 {len(data['users'])} 个用户、{len(data['posts'])} 篇帖子、"
+          f"{len(data['comments'])} 条评论、{len(data['likes'])} 个点赞")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import gzip
+from flask import request
+
+# 动态响应压缩：对 HTML/JSON 等文本响应按 Accept-Encoding 做 gzip 压缩
+class ResponseCompression:
+    def __init__(self, app=None):
+        self.min_size = 500
+        self.level = 6
+        self.mimetypes = {'text/html', 'application/json'}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESS_LEVEL', self.level)
+        self.mimetypes = set(app.config.get('COMPRESS_MIMETYPES', self.mimetypes))
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes):
+            return response
+        response.vary.add('Accept-Encoding')
+        if 'gzip' not in request.accept_encodings:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=self.level))
+        response.headers['Content-Encoding'] = 'gzip'
+        # 压缩后的表示与原文不同，强 ETag 改为弱 ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
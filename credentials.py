@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# 两个应用共用的 KDF，格式同 werkzeug 的 method 参数：优先取 PASSWORD_HASH_METHOD 环境变量
+# （可用 calibrate 按目标耗时选择），默认 pbkdf2-sha256，迭代次数取 werkzeug 当前的默认值
+DEFAULT_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+# 旧版 Streamlit 应用保存的无盐单轮 SHA-256 十六进制摘要
+_LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+def is_legacy_hash(hashed):
+    return bool(_LEGACY_SHA256.match(hashed or ''))
+
+def hash_password(password, method=DEFAULT_METHOD):
+    return generate_password_hash(password, method=method)
+
+# 校验密码，兼容旧版 SHA-256 摘要
+def verify_password(hashed, password):
+    if not hashed:
+        return False
+    if is_legacy_hash(hashed):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+    return check_password_hash(hashed, password)
+
+# 把 method 字符串拆成 (算法, 数值参数)，例如 'pbkdf2:sha256:600000' -> ('pbkdf2:sha256', (600000,))；
+# 省略参数时按 werkzeug 的默认值补全，无法解析时返回 None
+def parse_method(method):
+    parts = (method or '').split(':')
+    try:
+        if parts[0] == 'pbkdf2':
+            name = parts[1] if len(parts) > 1 else 'sha256'
+            iterations = int(parts[2]) if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+            return f'pbkdf2:{name}', (iterations,)
+        if parts[0] == 'scrypt':
+            return 'scrypt', tuple(int(p) for p in parts[1:]) or (2 ** 15, 8, 1)
+    except (IndexError, ValueError):
+        pass
+    return None
+
+# 旧版 SHA-256 摘要、算法与配置不同或参数低于配置时，在登录成功后重新哈希；
+# 参数比配置更高的哈希保留不动，调低配置不会降低已有密码的强度
+def needs_rehash(hashed, method=DEFAULT_METHOD):
+    if is_legacy_hash(hashed):
+        return True
+    stored = parse_method(hashed.split('$', 1)[0])
+    wanted = parse_method(method)
+    if stored is None or wanted is None or stored[0] != wanted[0]:
+        return True
+    return any(have < want for have, want in zip(stored[1], wanted[1]))
+
+# 选择 pbkdf2 迭代次数，使单次哈希耗时接近 target_ms（不低于 werkzeug 默认值），返回 method 字符串
+def calibrate(target_ms=250, hash_name='sha256'):
+    probe = 100000
+    start = time.perf_counter()
+    generate_password_hash('calibration', method=f'pbkdf2:{hash_name}:{probe}')
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    iterations = max(DEFAULT_PBKDF2_ITERATIONS, int(probe * target_ms / elapsed_ms) // 10000 * 10000)
+    return f'pbkdf2:{hash_name}:{iterations}'
+
+# 进程池中执行的函数必须是模块级函数才能被序列化
+def _hash_password(password, method):
+    return hash_password(password, method)
+
+def _check_password(hashed, password):
+    return verify_password(hashed, password)
+
+# 哈希队列已满、等待超时或进程池崩溃，调用方应返回“服务器繁忙”
+class HasherBusy(Exception):
+    pass
+
+# 在独立进程池中计算密码哈希，避免 CPU 密集的 pbkdf2 阻塞请求线程；
+# 同时排队的任务数有上限，超出时立即拒绝。名额在任务真正结束时才归还，
+# 等待超时的任务仍在进程池中运行期间继续占用名额。记录完成、拒绝、超时、失败次数和耗时指标
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=16, timeout=10, method=DEFAULT_METHOD):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.pending = 0
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    # 进程池在第一次使用时创建，这样多进程部署时每个工作进程各自拥有进程池。
+    # 创建时请求线程之外还有其他线程在运行，fork 可能复制被其他线程持有的锁（日志、连接池）导致子进程死锁，
+    # 所以用 forkserver（不支持时用 spawn）启动工作进程；工作函数只依赖本模块和 werkzeug，启动开销很小
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    # 工作进程异常退出后进程池不可再用，丢弃它，下一次调用重新创建
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # 任务结束（包括调用方已超时放弃的任务）时归还名额并记录结果
+    def _finish(self, future, start):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self._latencies.append(time.perf_counter() - start)
+        self._slots.release()
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        start = time.perf_counter()
+        with self._lock:
+            self.pending += 1
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            with self._lock:
+                self.pending -= 1
+                self.failed += 1
+            self._slots.release()
+            self._discard_executor(executor)
+            raise HasherBusy()
+        future.add_done_callback(lambda future: self._finish(future, start))
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise HasherBusy()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise HasherBusy()
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.method)
+
+    def verify(self, hashed, password):
+        return self._run(_check_password, hashed, password)
+
+    def needs_rehash(self, hashed):
+        return needs_rehash(hashed, self.method)
+
+    # 耗时指标（毫秒），基于最近 1000 次完成的调用
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = {
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'failed': self.failed,
+                'pending': self.pending,
+                'max_pending': self.max_pending
+            }
+        for name, q in (('p50_ms', 0.5), ('p95_ms', 0.95), ('max_ms', 1.0)):
+            metrics[name] = round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else 0.0
+        return metrics
+
+# 按昵称限制连续登录失败：窗口期内失败次数达到上限后锁定一段时间，
+# 锁定期间不再计算哈希，重复的失败登录不会占用 CPU
+class LoginThrottle:
+    def __init__(self, max_failures=5, window=300, lockout=300):
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_failures = app.config.get('LOGIN_MAX_FAILURES', self.max_failures)
+        self.window = app.config.get('LOGIN_FAILURE_WINDOW', self.window)
+        self.lockout = app.config.get('LOGIN_LOCKOUT_SECONDS', self.lockout)
+
+    # 剩余锁定秒数，未锁定时为 0
+    def locked_for(self, nickname):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.get(nickname, [])
+        # 最近 max_failures 次失败都发生在一个窗口期内才锁定
+        recent = [t for t in failures if failures[-1] - t < self.window]
+        if len(recent) < self.max_failures:
+            return 0
+        return max(0, int(failures[-1] + self.lockout - now + 0.999))
+
+    def record_failure(self, nickname):
+        now = time.monotonic()
+        with self._lock:
+            failures = [t for t in self._failures.get(nickname, []) if now - t < self.window]
+            failures.append(now)
+            self._failures[nickname] = failures[-self.max_failures:]
+            # 定期清理过期记录，防止字典无限增长
+            if len(self._failures) > 10000:
+                horizon = max(self.window, self.lockout)
+                self._failures = {k: v for k, v in self._failures.items() if now - v[-1] < horizon}
+
+    def record_success(self, nickname):
+        with self._lock:
+            self._failures.pop(nickname, None)
+
+# 命令行：按目标耗时给出 PASSWORD_HASH_METHOD 的取值
+# 例如 python credentials.py --target-ms 250
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按目标耗时选择 pbkdf2 迭代次数')
+    parser.add_argument('--target-ms', type=float, default=250)
+    args = parser.parse_args()
+    method = calibrate(args.target_ms)
+    start = time.perf_counter()
+    hash_password('benchmark', method)
+    print(f"{method}  (实测 {(time.perf_counter() - start) * 1000:.0f} ms)")
@@ -0,0 +1,501 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pandas as pd
+import search
+
+# 数据库文件路径（WAL 模式的 SQLite，替代整表重写的 CSV）
+DB_FILE = "data/app.db"
+
+# 表结构，表名与原 CSV 文件名一致
+TABLES = {
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            nickname TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            avatar TEXT,
+            is_admin INTEGER NOT NULL DEFAULT 0
+        )""",
+    "posts": """
+        CREATE TABLE IF NOT EXISTS posts (
+            post_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nickname TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )""",
+    "comments": """
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            nickname TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )""",
+    "likes": """
+        CREATE TABLE IF NOT EXISTS likes (
+            like_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            nickname TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            UNIQUE (post_id, nickname)
+        )""",
+    "admin_requests": """
+        CREATE TABLE IF NOT EXISTS admin_requests (
+            request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nickname TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )""",
+}
+
+# 常用查询的索引
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_posts_nickname ON posts (nickname)",
+    "CREATE INDEX IF NOT EXISTS ix_posts_created_at ON posts (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_comments_post_id ON comments (post_id)",
+    "CREATE INDEX IF NOT EXISTS ix_comments_nickname ON comments (nickname)",
+    "CREATE INDEX IF NOT EXISTS ix_comments_created_at ON comments (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_likes_nickname ON likes (nickname)",
+    "CREATE INDEX IF NOT EXISTS ix_admin_requests_nickname_status ON admin_requests (nickname, status)",
+]
+
+# 全文索引覆盖的表：(表名, 索引列)
+SEARCH_INDEXES = {
+    "posts": ("content",),
+    "comments": ("content",),
+}
+
+# 每张表的主键列
+PRIMARY_KEYS = {
+    "users": "nickname",
+    "posts": "post_id",
+    "comments": "comment_id",
+    "likes": "like_id",
+    "admin_requests": "request_id",
+}
+
+# 维护统计计数器的表，以及计数键依赖的列（这些列被修改时计数需要迁移）
+STAT_TABLES = ("users", "posts", "comments", "likes")
+STAT_COLUMNS = {"users": ("role",), "posts": ("created_at",)}
+
+_local = threading.local()
+
+# 进程级表缓存 {表名: (写入代数, DataFrame)}，所有 Streamlit 会话共享
+_cache = {}
+_cache_lock = threading.Lock()
+
+# 由表派生的内存索引 {索引名: (写入代数, 索引)}，同样按写入代数失效
+_indexes = {}
+
+# 由 CSV 路径得到表名，例如 data/users.csv -> users
+def table_name(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+# 获取当前线程的数据库连接（每个 Streamlit 会话线程一个连接）
+def get_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        search.register_functions(conn)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conn = conn
+    return conn
+
+# 写事务：BEGIN IMMEDIATE 先拿写锁，多会话并发写入不会互相覆盖；可嵌套
+@contextmanager
+def transaction():
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+def _where_clause(where):
+    if not where:
+        return "", []
+    return " WHERE " + " AND ".join(f"{column} = ?" for column in where), list(where.values())
+
+# 建表、建索引，并在首次运行时从旧 CSV 文件迁移数据
+def init_db(csv_files=()):
+    with transaction() as conn:
+        for ddl in TABLES.values():
+            conn.execute(ddl)
+        for ddl in INDEXES:
+            conn.execute(ddl)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        migrated = conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+        if migrated is None:
+            for file_path in csv_files:
+                _migrate_csv(conn, file_path)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', '1')")
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, columns in SEARCH_INDEXES.items():
+            for statement in search.index_statements(table, PRIMARY_KEYS[table], columns):
+                conn.execute(statement)
+            if search.index_name(table) not in existing:
+                for statement in search.rebuild_statements(table, PRIMARY_KEYS[table], columns):
+                    conn.execute(statement)
+        built = conn.execute("SELECT value FROM meta WHERE key = 'stats_built'").fetchone()
+        if built is None:
+            for table in STAT_TABLES:
+                _rebuild_stats(conn, table)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('stats_built', '1')")
+
+# 已初始化的数据库文件。Streamlit 每次重新运行页面都会执行 app2.py 的模块级代码，
+# 建表和迁移检查每个进程对每个数据库只做一次，页面渲染不再为此等待写锁
+_initialized = set()
+_init_lock = threading.Lock()
+
+def ensure_db(csv_files=()):
+    path = os.path.abspath(DB_FILE)
+    with _init_lock:
+        if path in _initialized:
+            return
+        init_db(csv_files)
+        _initialized.add(path)
+
+# 一次性导入旧 CSV；旧版本按 len(df)+1 生成 id 可能重复，重复的 id 交给数据库重新分配
+def _migrate_csv(conn, file_path):
+    table = table_name(file_path)
+    if table not in TABLES or not os.path.exists(file_path):
+        return
+    df = pd.read_csv(file_path)
+    if df.empty:
+        return
+    columns = [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+    df = df[[column for column in columns if column in df.columns]]
+    key = PRIMARY_KEYS[table]
+    if table == "users":
+        df = df.drop_duplicates(subset=key)
+        if "is_admin" in df.columns:
+            df["is_admin"] = df["is_admin"].map(lambda value: 1 if str(value).lower() in ("true", "1", "1.0") else 0)
+    else:
+        df = df.astype(object).where(df.notna(), None)
+        df.loc[df[key].duplicated(), key] = None
+    if table == "likes":
+        df = df.drop_duplicates(subset=["post_id", "nickname"])
+    placeholders = ", ".join("?" for _ in df.columns)
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})",
+        df.itertuples(index=False, name=None)
+    )
+
+# 写入代数：每次写入在同一事务内加一，其他进程的写入也能被察觉
+def _bump_generation(conn, table):
+    conn.execute(
+        "INSERT INTO generations (name, generation) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET generation = generation + 1",
+        (table,)
+    )
+
+# 一行数据对应的统计键：表总行数，用户按角色，帖子按发布日期
+def _stat_keys(table, row):
+    keys = [f"rows:{table}"]
+    if table == "users":
+        keys.append(f"users:{row['role']}")
+    elif table == "posts":
+        keys.append(f"posts_per_day:{str(row['created_at'])[:10]}")
+    return keys
+
+# 在调用方的写事务内按行增减统计计数器
+def _bump_stats(conn, table, rows, sign):
+    deltas = {}
+    for row in rows:
+        for key in _stat_keys(table, row):
+            deltas[key] = deltas.get(key, 0) + sign
+    conn.executemany(
+        "INSERT INTO stats (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        [(key, delta) for key, delta in deltas.items() if delta]
+    )
+
+# 写入前取出受影响行中计数键依赖的列
+def _stat_rows(conn, table, clause, params):
+    columns = ", ".join(STAT_COLUMNS.get(table, ())) or "1"
+    return [dict(row) for row in conn.execute(f"SELECT {columns} FROM {table}{clause}", params)]
+
+# 按表中现有数据重建一张表的统计计数器
+def _rebuild_stats(conn, table):
+    conn.execute("DELETE FROM stats WHERE name = ?", (f"rows:{table}",))
+    if table == "users":
+        conn.execute("DELETE FROM stats WHERE name LIKE 'users:%'")
+    elif table == "posts":
+        conn.execute("DELETE FROM stats WHERE name LIKE 'posts_per_day:%'")
+    _bump_stats(conn, table, _stat_rows(conn, table, "", []), 1)
+
+# 读取统计计数器：各表行数和各身份用户数（行数固定，主键范围查询一次读出）；
+# 每日发帖数每天新增一行，只在 days 大于 0 时读取最近 days 天
+def stats(days=0):
+    result = {"users": 0, "users_by_role": {}, "posts": 0, "comments": 0, "likes": 0}
+    sql = ("SELECT name, value FROM stats WHERE (name > 'rows:' AND name < 'rows;') "
+           "OR (name > 'users:' AND name < 'users;')")
+    params = []
+    if days > 0:
+        result["posts_per_day"] = {}
+        sql += " OR (name >= ? AND name < 'posts_per_day;')"
+        params.append(f"posts_per_day:{(datetime.now() - timedelta(days=days - 1)):%Y-%m-%d}")
+    for name, value in get_connection().execute(sql, params):
+        kind, key = name.split(":", 1)
+        if kind == "rows":
+            result[key] = value
+        elif kind == "users" and value:
+            result["users_by_role"][key] = value
+        elif kind == "posts_per_day" and value:
+            result["posts_per_day"][key] = value
+    return result
+
+# 获取表当前的写入代数
+def generation(table):
+    row = get_connection().execute("SELECT generation FROM generations WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+# 读事务：其中的多条查询看到同一个数据库快照（WAL 模式下读写互不阻塞）；可嵌套
+@contextmanager
+def snapshot():
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+# 读取整张表，返回 (写入代数, DataFrame)，代数与数据来自同一快照；
+# 代数未变时直接返回缓存的 DataFrame（只读，调用方不要原地修改）
+def _load_table(table):
+    with snapshot():
+        current = generation(table)
+        with _cache_lock:
+            cached = _cache.get(table)
+        if cached is not None and cached[0] == current:
+            return cached
+        df = pd.read_sql_query(f"SELECT * FROM {table} ORDER BY rowid", get_connection())
+    with _cache_lock:
+        _cache[table] = (current, df)
+    return current, df
+
+def load_table(table):
+    return _load_table(table)[1]
+
+# 获取由一张或多张表构建的索引，任一表的写入代数变化后才重新构建；
+# 新索引标记为实际读到的数据的代数，而不是检查时的代数，避免并发写入的点赞被增量更新重复计入
+def _cached_index(name, tables, build):
+    current = tuple(generation(table) for table in tables)
+    with _cache_lock:
+        cached = _indexes.get(name)
+    if cached is not None and cached[0] == current:
+        return cached[1]
+    loaded = [_load_table(table) for table in tables]
+    index = build(*(df for _, df in loaded))
+    with _cache_lock:
+        _indexes[name] = (tuple(loaded_generation for loaded_generation, _ in loaded), index)
+    return index
+
+# 用户索引：昵称 -> {nickname, password, role, avatar, is_admin}
+def user_index():
+    return _cached_index("users", ("users",), lambda df: {user["nickname"]: user for user in df.to_dict("records")})
+
+# 帖子流：帖子与用户按昵称连接一次，带上作者角色和头像，可按角色筛选，按发布时间倒序
+def feed_frame(role=None):
+    users_df = load_table("users")[["nickname", "role", "avatar"]]
+    feed = load_table("posts").merge(users_df, on="nickname", how="left")
+    if role is not None:
+        feed = feed[feed["role"] == role]
+    return feed.sort_values("created_at", ascending=False)
+
+# 评论分组：post_id -> 按发表顺序排列的评论列表，每条评论带上作者角色和头像
+def _build_comment_groups(comments_df, users_df):
+    comments_df = comments_df.merge(users_df[["nickname", "role", "avatar"]], on="nickname", how="left")
+    return {int(post_id): group.to_dict("records") for post_id, group in comments_df.groupby("post_id", sort=False)}
+
+def comments_by_post():
+    return _cached_index("comments", ("comments", "users"), _build_comment_groups)
+
+# 点赞索引：每个帖子的点赞数和每个用户点赞过的帖子集合
+def _build_like_index(df):
+    counts = {int(post_id): int(count) for post_id, count in df.groupby("post_id").size().items()}
+    by_user = {nickname: set(int(post_id) for post_id in post_ids) for nickname, post_ids in df.groupby("nickname")["post_id"]}
+    return {"counts": counts, "by_user": by_user}
+
+def like_index():
+    return _cached_index("likes", ("likes",), _build_like_index)
+
+# 把本进程的一次点赞变化直接应用到缓存的点赞索引上，避免整表重建；
+# 只有缓存恰好是写入前那一代时才能增量更新，否则留给下次读取时重建
+def _apply_like_delta(post_id, nickname, delta, new_generation):
+    with _cache_lock:
+        cached = _indexes.get("likes")
+        if cached is None or cached[0] != (new_generation - 1,):
+            return
+        index = cached[1]
+        index["counts"][post_id] = index["counts"].get(post_id, 0) + delta
+        liked = index["by_user"].setdefault(nickname, set())
+        if delta > 0:
+            liked.add(post_id)
+        else:
+            liked.discard(post_id)
+        _indexes["likes"] = ((new_generation,), index)
+
+# 切换点赞状态，返回切换后是否为已点赞
+def toggle_like(post_id, nickname, created_at):
+    post_id = int(post_id)
+    with transaction() as conn:
+        changed = conn.execute("DELETE FROM likes WHERE post_id = ? AND nickname = ?", (post_id, nickname)).rowcount
+        delta = -1
+        if not changed:
+            changed = conn.execute(
+                "INSERT OR IGNORE INTO likes (post_id, nickname, created_at) VALUES (?, ?, ?)",
+                (post_id, nickname, created_at)
+            ).rowcount
+            delta = 1
+        if not changed:
+            return False
+        _bump_generation(conn, "likes")
+        _bump_stats(conn, "likes", [{}], delta)
+        new_generation = conn.execute("SELECT generation FROM generations WHERE name = 'likes'").fetchone()[0]
+    _apply_like_delta(post_id, nickname, delta, new_generation)
+    return delta > 0
+
+# 批量获取一组帖子的点赞数和当前用户是否点赞：{post_id: (点赞数, 是否已点赞)}
+def like_summary(post_ids, nickname=None):
+    index = like_index()
+    liked = index["by_user"].get(nickname, set())
+    return {int(post_id): (index["counts"].get(int(post_id), 0), int(post_id) in liked) for post_id in post_ids}
+
+# 清空进程级缓存
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _indexes.clear()
+
+# 用 DataFrame 整体替换一张表（兼容旧的 save_data 调用）
+def replace_table(df, table):
+    with transaction() as conn:
+        _bump_generation(conn, table)
+        conn.execute(f"DELETE FROM {table}")
+        if not df.empty:
+            df = df.astype(object).where(df.notna(), None)
+            placeholders = ", ".join("?" for _ in df.columns)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})",
+                df.itertuples(index=False, name=None)
+            )
+        if table in STAT_TABLES:
+            _rebuild_stats(conn, table)
+
+# 审核列表：按作者、作者角色、发布日期范围在数据库中筛选并分页，
+# 返回 (当前页的行（带作者角色）, 符合条件的总行数)，按发布时间倒序
+def moderation_page(table, nickname=None, role=None, date_from=None, date_to=None, page=1, per_page=20):
+    conditions, params = [], []
+    if nickname:
+        conditions.append("t.nickname = ?")
+        params.append(nickname)
+    if role:
+        conditions.append("u.role = ?")
+        params.append(role)
+    if date_from:
+        conditions.append("t.created_at >= ?")
+        params.append(str(date_from))
+    if date_to:
+        # 结束日期当天的记录也包含在内
+        conditions.append("t.created_at < date(?, '+1 day')")
+        params.append(str(date_to))
+    clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    source = f"{table} t LEFT JOIN users u ON u.nickname = t.nickname"
+    conn = get_connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM {source}{clause}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT t.*, u.role AS role FROM {source}{clause} "
+        f"ORDER BY t.created_at DESC, t.{PRIMARY_KEYS[table]} DESC LIMIT ? OFFSET ?",
+        params + [per_page, (max(1, page) - 1) * per_page]
+    ).fetchall()
+    return [dict(row) for row in rows], total
+
+# 全文检索帖子或评论，返回 (按相关度排序的行, 命中总数)
+def search_rows(table, query, limit=20, offset=0):
+    ids, total = search.search(get_connection().execute, table, query, limit, offset)
+    if not ids:
+        return [], total
+    key = PRIMARY_KEYS[table]
+    placeholders = ", ".join("?" for _ in ids)
+    rows = {row[key]: dict(row) for row in get_connection().execute(f"SELECT * FROM {table} WHERE {key} IN ({placeholders})", ids)}
+    return [rows[row_id] for row_id in ids if row_id in rows], total
+
+# 按列等值条件查询，返回字典列表（走主键或索引）
+def find(table, **where):
+    clause, params = _where_clause(where)
+    rows = get_connection().execute(f"SELECT * FROM {table}{clause}", params).fetchall()
+    return [dict(row) for row in rows]
+
+# 追加一行，返回新行的 rowid；or_ignore 时违反唯一约束的插入被忽略
+def insert(table, row, or_ignore=False):
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    placeholders = ", ".join("?" for _ in row)
+    with transaction() as conn:
+        cursor = conn.execute(f"{verb} INTO {table} ({', '.join(row)}) VALUES ({placeholders})", list(row.values()))
+        if not cursor.rowcount:
+            return None
+        _bump_generation(conn, table)
+        if table in STAT_TABLES:
+            _bump_stats(conn, table, [row], 1)
+        return cursor.lastrowid
+
+# 按条件更新，返回受影响行数
+def update(table, values, **where):
+    clause, params = _where_clause(where)
+    assignments = ", ".join(f"{column} = ?" for column in values)
+    # 修改了计数键依赖的列（如用户角色）时，把计数从旧键迁移到新键
+    moves_stats = bool(set(values) & set(STAT_COLUMNS.get(table, ())))
+    with transaction() as conn:
+        if moves_stats:
+            rowids = [row[0] for row in conn.execute(f"SELECT rowid FROM {table}{clause}", params)]
+            by_rowid = f" WHERE rowid IN ({', '.join('?' for _ in rowids)})"
+            _bump_stats(conn, table, _stat_rows(conn, table, by_rowid, rowids), -1)
+        count = conn.execute(f"UPDATE {table} SET {assignments}{clause}", list(values.values()) + params).rowcount
+        if moves_stats:
+            _bump_stats(conn, table, _stat_rows(conn, table, by_rowid, rowids), 1)
+        if count:
+            _bump_generation(conn, table)
+        return count
+
+# 按一列的取值列表批量删除（一条 DELETE ... IN 语句），返回删除行数
+def delete_many(table, column, values):
+    values = list(values)
+    if not values:
+        return 0
+    clause = f" WHERE {column} IN ({', '.join('?' for _ in values)})"
+    with transaction() as conn:
+        if table in STAT_TABLES:
+            _bump_stats(conn, table, _stat_rows(conn, table, clause, values), -1)
+        count = conn.execute(f"DELETE FROM {table}{clause}", values).rowcount
+        if count:
+            _bump_generation(conn, table)
+        return count
+
+# 按条件删除，返回删除行数
+def delete(table, **where):
+    clause, params = _where_clause(where)
+    with transaction() as conn:
+        if table in STAT_TABLES:
+            _bump_stats(conn, table, _stat_rows(conn, table, clause, params), -1)
+        count = conn.execute(f"DELETE FROM {table}{clause}", params).rowcount
+        if count:
+            _bump_generation(conn, table)
+        return count
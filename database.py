@@ -0,0 +1,78 @@
+import sqlite3
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# 只读连接池的 bind 名称
+READ_BIND = 'readonly'
+
+# 默认连接参数：WAL 让读写互不阻塞；NORMAL 在 WAL 下只在检查点时同步磁盘；
+# 写锁被占用时最多等待 busy_timeout 毫秒而不是立即报 "database is locked"；
+# cache_size 为负数表示 KiB
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -16000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# 只读连接：打开后即设置 query_only，误用它执行写语句会直接报错
+class ReadOnlyConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.execute('PRAGMA query_only = ON')
+
+# 配置了只读连接池时，GET/HEAD 请求中的查询走只读连接池；
+# 写语句和 flush 仍走主连接池，本次请求写入过之后的查询也改走主连接池，保证读到自己的写入
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif not self.info.get('wrote') and has_request_context() and request.method in ('GET', 'HEAD'):
+                engine = self._db.engines.get(READ_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+# SQLite 引擎配置：连接池大小、只读连接池，以及每个新连接上执行的 PRAGMA；
+# 需要在 db.init_app 之前初始化，因为连接池参数在创建引擎时读取
+class SQLiteProfile:
+    def __init__(self):
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        self._listening = False
+
+    def init_app(self, app):
+        self.pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+        url = make_url(uri) if uri else None
+        # 内存数据库使用单连接池，不接受连接池大小参数
+        if url is not None and url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+            options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.setdefault('pool_size', app.config.get('SQLITE_POOL_SIZE', 10))
+            options.setdefault('max_overflow', app.config.get('SQLITE_MAX_OVERFLOW', 10))
+            options.setdefault('pool_timeout', app.config.get('SQLITE_POOL_TIMEOUT', 30))
+            read_pool_size = app.config.get('SQLITE_READ_POOL_SIZE', 0)
+            if read_pool_size:
+                app.config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(READ_BIND, {
+                    'url': uri,
+                    'pool_size': read_pool_size,
+                    'max_overflow': read_pool_size,
+                    'pool_timeout': options['pool_timeout'],
+                    'connect_args': {'factory': ReadOnlyConnection},
+                })
+        if not self._listening:
+            event.listen(Engine, 'connect', self.configure_connection)
+            self._listening = True
+
+    def configure_connection(self, dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        for name, value in self.pragmas.items():
+            # 日志模式由主连接设置，只读连接不能修改
+            if name == 'journal_mode' and isinstance(dbapi_connection, ReadOnlyConnection):
+                continue
+            dbapi_connection.execute(f'PRAGMA {name} = {value}')
@@ -1,6 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from fragments import FragmentCache
+from assets import StaticAssets
+from compression import ResponseCompression
+from credentials import PasswordHasher, LoginThrottle
+from user_cache import UserCache
+from database import RoutingSession, SQLiteProfile
+from instrumentation import QueryInstrumentation
 
 # 创建扩展实例，但不初始化
-db = SQLAlchemy()
-login_manager = LoginManager()
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+sqlite_profile = SQLiteProfile()
+login_manager = LoginManager()
+fragment_cache = FragmentCache()
+static_assets = StaticAssets()
+compression = ResponseCompression()
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
+user_cache = UserCache()
+query_instrumentation = QueryInstrumentation()
\ No newline at end of file
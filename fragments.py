@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from markupsafe import Markup
+
+# 渲染片段缓存：按 (类型, id, 对象版本) 缓存渲染好的 HTML，
+# 条目数和总字节数超限时按 LRU 淘汰，并记录命中/未命中次数
+class FragmentCache:
+    def __init__(self, max_entries=1000, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = app.config.get('FRAGMENT_CACHE_MAX_BYTES', self.max_bytes)
+
+    # 删除对象后移除它们的片段（一次遍历处理一批 id），不为每个 id 保留状态
+    def invalidate(self, kind, object_ids):
+        self._remove(kind, 1, object_ids)
+
+    # 按分组移除片段，例如删除帖子时按帖子 id 移除其评论的片段，不需要先查出评论 id
+    def invalidate_group(self, kind, groups):
+        self._remove(kind, 3, groups)
+
+    def _remove(self, kind, position, values):
+        values = set(values)
+        if not values:
+            return
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == kind and key[position] in values]:
+                self._size -= len(self._entries.pop(key))
+
+    # 取缓存的片段，未命中时调用 render_func 渲染并写入缓存
+    # stamp 是对象自身的版本信息（如发布时间），防止 id 被复用后命中旧内容；
+    # group 是对象所属的分组（如评论所在的帖子），供 invalidate_group 使用；
+    # cacheable 为 False 时（片段含有临时内容）直接渲染，不读也不写缓存
+    def render(self, kind, object_id, stamp, render_func, cacheable=True, group=None):
+        if not cacheable:
+            with self._lock:
+                self.misses += 1
+            return Markup(render_func())
+        key = (kind, object_id, stamp, group)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = Markup(render_func())
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = html
+                self._size += len(html)
+                self._evict()
+        return html
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, html = self._entries.popitem(last=False)
+            self._size -= len(html)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+from flask import g, has_request_context, request
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 共用的数据访问模块：定位触发查询的代码行时跳过，指向调用它们的路由或模板
+HELPER_MODULES = ('models.py', 'database.py', 'search.py', 'fragments.py', 'instrumentation.py')
+
+# 一次请求中执行的 SQL 记录
+class RequestQueries:
+    def __init__(self):
+        self.statements = []  # [(SQL, 耗时毫秒)]
+        self.patterns = {}  # SELECT 语句 -> {'count', 'ms', 'location'}
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def total_ms(self):
+        return sum(ms for _, ms in self.statements)
+
+    @property
+    def slowest(self):
+        return max(self.statements, key=lambda statement: statement[1], default=None)
+
+    # 只有 SELECT 参与重复检测：计数器更新等写语句在一个请求中执行多次是正常的
+    def add(self, statement, ms, location, is_select):
+        self.statements.append((statement, ms))
+        if not is_select:
+            return
+        pattern = self.patterns.setdefault(statement, {'count': 0, 'ms': 0.0, 'location': location})
+        pattern['count'] += 1
+        pattern['ms'] += ms
+
+    # 同一条 SQL（参数不同）执行次数达到阈值，多半是循环里触发的延迟加载
+    def repeated(self, threshold):
+        return [(statement, pattern) for statement, pattern in self.patterns.items() if pattern['count'] >= threshold]
+
+# 按请求统计 SQL（需要时开启）：查询次数、数据库耗时、最慢语句、重复语句；
+# 结果写入响应头 X-Query-Count / X-Query-Time-Ms，可选在 HTML 页面底部显示调试面板，
+# 超出查询预算或疑似 N+1 的请求写警告日志，并指出触发查询的模板行
+class QueryInstrumentation:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.budget = 10
+        self.n_plus_one_threshold = 3
+        self.debug_panel = False
+        self.root_path = ''
+        self.logger = None
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SQL_INSTRUMENTATION', self.enabled)
+        if not self.enabled:
+            return
+        self.budget = app.config.get('SQL_QUERY_BUDGET', self.budget)
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        self.debug_panel = app.config.get('SQL_DEBUG_PANEL', self.debug_panel)
+        self.root_path = app.root_path
+        self.logger = app.logger
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+            self._listening = True
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.sql_queries = RequestQueries()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        if not has_request_context():
+            return
+        queries = g.get('sql_queries')
+        if queries is None:
+            return
+        is_select = (not (context.isinsert or context.isupdate or context.isdelete)
+                     and statement.lstrip().upper().startswith(('SELECT', 'WITH')))
+        location = None
+        if is_select and statement not in queries.patterns:
+            location = self._caller_location()
+        queries.add(statement, (time.perf_counter() - started) * 1000, location, is_select)
+
+    # 触发查询的位置：优先取调用栈中最近的 Jinja 模板行，否则取应用目录下最近的代码行（跳过共用模块）
+    def _caller_location(self):
+        code_location = None
+        frame = sys._getframe(2)
+        while frame is not None:
+            template = frame.f_globals.get('__jinja_template__')
+            if template is not None:
+                return f"{template.name}:{template.get_corresponding_lineno(frame.f_lineno)}"
+            filename = frame.f_code.co_filename
+            if (code_location is None and filename.startswith(self.root_path)
+                    and os.path.basename(filename) not in HELPER_MODULES and 'site-packages' not in filename):
+                code_location = f"{os.path.relpath(filename, self.root_path)}:{frame.f_lineno}"
+            frame = frame.f_back
+        return code_location
+
+    def _finish(self, response):
+        queries = g.pop('sql_queries', None)
+        if queries is None:
+            return response
+        response.headers['X-Query-Count'] = str(queries.count)
+        response.headers['X-Query-Time-Ms'] = f"{queries.total_ms:.1f}"
+
+        repeated = queries.repeated(self.n_plus_one_threshold)
+        if queries.count > self.budget or repeated:
+            self.logger.warning(
+                "%s %s 执行了 %d 条 SQL（预算 %d），耗时 %.1f ms%s",
+                request.method, request.path, queries.count, self.budget, queries.total_ms,
+                ''.join(f"\n  疑似 N+1：{pattern['count']} 次，位置 {pattern['location']}：{' '.join(statement.split())[:200]}"
+                        for statement, pattern in repeated)
+            )
+
+        if self.debug_panel and response.mimetype == 'text/html' and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                response.set_data(body.replace('</body>', self._render_panel(queries, repeated) + '</body>', 1))
+        return response
+
+    def _render_panel(self, queries, repeated):
+        lines = [f"SQL: {queries.count} 条（预算 {self.budget}），共 {queries.total_ms:.1f} ms"]
+        if queries.slowest:
+            statement, ms = queries.slowest
+            lines.append(f"最慢 {ms:.1f} ms：{' '.join(statement.split())}")
+        for statement, pattern in repeated:
+            lines.append(f"疑似 N+1：{pattern['count']} 次，{pattern['ms']:.1f} ms，位置 {pattern['location']}：{' '.join(statement.split())}")
+        items = ''.join(f"<li>{escape(line)}</li>" for line in lines)
+        return ('<div id="sql-debug-panel" style="font: 12px monospace; background: #fffbe6; border-top: 1px solid #e0c060; '
+                f'padding: 0.5rem 1rem;"><ul>{items}</ul></div>')
@@ -0,0 +1,132 @@
+import click
+from datetime import datetime
+from flask.cli import with_appcontext
+from extensions import db
+from models import User, Post, Comment, rebuild_stats
+import search
+
+# 数据库结构版本迁移：当前版本记在 SQLite 的 PRAGMA user_version 中，
+# upgrade() 依次执行版本号更大的迁移，每完成一个就更新版本号。
+# 新建的数据库由 db.create_all() 建表，迁移同样会执行一遍，所以每个迁移都要能重复执行
+# （先检查列/索引是否存在）。以后修改表结构时在 MIGRATIONS 末尾追加新版本，不要修改已有的迁移。
+
+# 全文索引覆盖的表：(表名, 主键, 索引列, 各列 bm25 权重)
+SEARCH_INDEXES = [
+    ('post', 'id', ('title', 'content'), (2.0, 1.0)),
+    ('comment', 'id', ('content',), None),
+]
+
+def add_column(table, name, ddl):
+    connection = db.session.connection()
+    if name in [column['name'] for column in db.inspect(connection).get_columns(table)]:
+        return False
+    connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+    return True
+
+# 版本 1：帖子评论数冗余列
+def add_comment_count():
+    if add_column('post', 'comment_count', 'INTEGER NOT NULL DEFAULT 0'):
+        db.session.execute(db.text("UPDATE post SET comment_count = (SELECT COUNT(*) FROM comment WHERE comment.post_id = post.id)"))
+
+# 创建模型中声明、数据库中还没有的索引（新增索引时追加一个调用它的迁移）
+def create_model_indexes():
+    connection = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+# 版本 3：全文索引表和同步触发器，索引表是新建的则用现有数据填充
+def create_search_indexes():
+    connection = db.session.connection()
+    existing = db.inspect(connection).get_table_names()
+    for table, key, columns, weights in SEARCH_INDEXES:
+        created = search.index_name(table) not in existing
+        for statement in search.index_statements(table, key, columns, weights):
+            connection.exec_driver_sql(statement)
+        if created:
+            for statement in search.rebuild_statements(table, key, columns):
+                connection.exec_driver_sql(statement)
+
+# (版本号, 说明, 迁移函数)
+MIGRATIONS = [
+    (1, '帖子评论数冗余列', add_comment_count),
+    (2, '首页分页、评论、作者外键和发布时间索引', create_model_indexes),
+    (3, '帖子和评论全文索引', create_search_indexes),
+    (4, '统计计数器', rebuild_stats),
+]
+
+def current_version():
+    return db.session.connection().exec_driver_sql("PRAGMA user_version").scalar()
+
+# 执行所有未执行的迁移，返回执行了的版本号列表
+def upgrade():
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version():
+            continue
+        migrate()
+        db.session.connection().exec_driver_sql(f"PRAGMA user_version = {version}")
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+# 热点查询，与 routes.py 中的查询形状一致：(名称, 语句, 是否允许临时排序)；
+# 语句中的取值只是占位，检查时参数一律传 NULL，不影响执行计划。
+# 按作者筛选后的结果集很小，允许在内存中排序；其余查询必须由索引提供顺序
+def hot_queries():
+    day = datetime(2024, 1, 1)
+    return [
+        ('首页第一页', db.select(Post).order_by(Post.date_posted.desc(), Post.id.desc()).limit(21), False),
+        ('首页游标翻页', db.select(Post).where(db.tuple_(Post.date_posted, Post.id) < db.tuple_(day, 1))
+            .order_by(Post.date_posted.desc(), Post.id.desc()).limit(21), False),
+        ('帖子详情评论分页', db.select(Comment).where(Comment.post_id == 1)
+            .order_by(Comment.date_posted, Comment.id).limit(50).offset(50), False),
+        ('评论审核列表', db.select(Comment).order_by(Comment.date_posted.desc(), Comment.id.desc()).limit(50), False),
+        ('按日期筛选帖子', db.select(Post).where(Post.date_posted >= day, Post.date_posted < day)
+            .order_by(Post.date_posted.desc(), Post.id.desc()).limit(50), False),
+        ('按作者筛选帖子', db.select(Post).join(User, Post.user_id == User.id).where(User.nickname == 'x')
+            .order_by(Post.date_posted.desc(), Post.id.desc()).limit(50), True),
+        ('按作者筛选评论', db.select(Comment).join(User, Comment.user_id == User.id).where(User.nickname == 'x')
+            .order_by(Comment.date_posted.desc(), Comment.id.desc()).limit(50), True),
+        ('批量删除帖子的评论', db.delete(Comment).where(Comment.post_id.in_([1, 2])), False),
+        ('批量删除评论计数', db.select(Comment.id, Comment.post_id).where(Comment.id.in_([1, 2])), False),
+    ]
+
+# 用 EXPLAIN QUERY PLAN 检查热点查询，返回 [(名称, 执行计划各行, 问题列表)]；
+# 全表扫描（SCAN 且没有 USING INDEX）和不允许的临时排序视为问题
+def check_query_plans():
+    connection = db.session.connection()
+    results = []
+    for name, statement, allow_sort in hot_queries():
+        compiled = statement.compile(connection, compile_kwargs={'render_postcompile': True})
+        params = [None] * len(compiled.positiontup or ())
+        plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(params))]
+        problems = [line for line in plan
+                    if (line.startswith('SCAN ') and 'USING' not in line)
+                    or ('TEMP B-TREE' in line and not allow_sort)]
+        results.append((name, plan, problems))
+    return results
+
+# 命令行：flask --app app upgrade-db
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_command():
+    db.create_all()
+    before = current_version()
+    applied = upgrade()
+    click.echo(f"数据库版本 {before} -> {current_version()}，执行迁移 {applied or '无'}")
+
+# 命令行：flask --app app check-query-plans，有问题时以状态码 1 退出
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    if current_version() < MIGRATIONS[-1][0]:
+        raise click.ClickException(f"数据库版本 {current_version()} 落后，请先执行 flask --app app upgrade-db")
+    failed = False
+    for name, plan, problems in check_query_plans():
+        click.echo(f"{'✗' if problems else '✓'} {name}")
+        for line in plan:
+            click.echo(f"    {line}")
+        failed = failed or bool(problems)
+    if failed:
+        raise SystemExit(1)
@@ -1,33 +1,179 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_login import UserMixin
-from extensions import db, login_manager
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from extensions import db, login_manager, user_cache
+import search
 
-# 注册用户加载器
+# 注册用户加载器：优先使用缓存的身份记录，未命中时才查询 user 表
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    record = user_cache.get(user_id)
+    if record is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        record = user_cache.set(user)
+    return record
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     nickname = db.Column(db.String(20), unique=True, nullable=False)
-    password = db.Column(db.String(60), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(10), nullable=False)  # 'parent' or 'child'
-    avatar = db.Column(db.String(20), nullable=False, default='default.jpg')
+    avatar = db.Column(db.String(100), nullable=False, default='default.jpg')
     is_developer = db.Column(db.Boolean, default=False)
     posts = db.relationship('Post', backref='author', lazy=True)
     comments = db.relationship('Comment', backref='author', lazy=True)
 
+# 用户行修改或删除时（例如 is_developer 变化）使缓存的身份记录失效
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
 class Post(db.Model):
+    # 首页按 (发布时间, id) 倒序分页，复合索引保证游标查询走索引，也覆盖按发布时间的筛选
+    __table_args__ = (
+        db.Index('ix_post_date_posted_id', 'date_posted', 'id'),
+        db.Index('ix_post_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 评论数冗余计数，随评论增删维护
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
 
 class Comment(db.Model):
+    # 帖子详情页按帖子取评论并按时间分页，删除帖子时按 post_id 级联删除；
+    # 后台审核列表按发布时间倒序
+    __table_args__ = (
+        db.Index('ix_comment_post_id_date_posted', 'post_id', 'date_posted', 'id'),
+        db.Index('ix_comment_user_id', 'user_id'),
+        db.Index('ix_comment_date_posted_id', 'date_posted', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
\ No newline at end of file
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+
+# 全局计数器，例如 content_version：每次帖子/评论写入加一，用于生成 ETag
+class Counter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# 递增计数器（不存在时创建），与调用方的写入在同一事务中提交
+def bump_counter(name, amount=1, connection=None):
+    now = datetime.utcnow()
+    table = Counter.__table__
+    stmt = sqlite_insert(table).values(name=name, value=amount, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'value': table.c.value + stmt.excluded.value, 'updated_at': now}
+    )
+    (connection or db.session).execute(stmt)
+
+# 统计计数器：用户数（总数和按角色）、帖子数、每日发帖数、评论数
+def stat_keys(obj):
+    if isinstance(obj, User):
+        return ['stats:users', f'stats:users:{obj.role}']
+    if isinstance(obj, Post):
+        return ['stats:posts', f'stats:posts_per_day:{obj.date_posted:%Y-%m-%d}']
+    if isinstance(obj, Comment):
+        return ['stats:comments']
+    return []
+
+# 每次 flush 后按新增/删除的对象更新统计计数器，与数据写入在同一事务中提交
+@db.event.listens_for(db.Session, 'after_flush')
+def update_stats(session, flush_context):
+    deltas = {}
+    for obj, delta in [(obj, 1) for obj in session.new] + [(obj, -1) for obj in session.deleted]:
+        for key in stat_keys(obj):
+            deltas[key] = deltas.get(key, 0) + delta
+    connection = session.connection()
+    for key, delta in deltas.items():
+        if delta:
+            bump_counter(key, delta, connection)
+
+# 批量删除帖子及其评论：每张表一条 DELETE 语句，不把评论取回内存。批量语句不经过 ORM 的 flush，
+# 统计计数器在这里按删除前的分组计数和删除的行数扣减；返回实际删除的帖子数
+def delete_posts(post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    day = db.func.strftime('%Y-%m-%d', Post.date_posted)
+    deleted = 0
+    for date, count in db.session.query(day, db.func.count()).filter(Post.id.in_(post_ids)).group_by(day):
+        bump_counter(f'stats:posts_per_day:{date}', -count)
+        deleted += count
+    comments = Comment.query.filter(Comment.post_id.in_(post_ids)).delete(synchronize_session=False)
+    Post.query.filter(Post.id.in_(post_ids)).delete(synchronize_session=False)
+    bump_counter('stats:posts', -deleted)
+    bump_counter('stats:comments', -comments)
+    return deleted
+
+# 批量删除评论，并按帖子扣减 comment_count；返回实际删除的评论 id
+def delete_comments(comment_ids):
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return []
+    rows = db.session.query(Comment.id, Comment.post_id).filter(Comment.id.in_(comment_ids)).all()
+    per_post = {}
+    for _, post_id in rows:
+        per_post[post_id] = per_post.get(post_id, 0) + 1
+    Comment.query.filter(Comment.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    if per_post:
+        Post.query.filter(Post.id.in_(per_post)).update(
+            {Post.comment_count: Post.comment_count - db.case(per_post, value=Post.id, else_=0)},
+            synchronize_session=False
+        )
+    bump_counter('stats:comments', -len(rows))
+    return [row.id for row in rows]
+
+# 按表中现有数据重建统计计数器（旧数据库升级或计数出错时使用）
+def rebuild_stats():
+    Counter.query.filter(Counter.name.like('stats:%')).delete(synchronize_session=False)
+    counts = {'stats:users': User.query.count(), 'stats:posts': Post.query.count(), 'stats:comments': Comment.query.count()}
+    for role, count in db.session.query(User.role, db.func.count()).group_by(User.role):
+        counts[f'stats:users:{role}'] = count
+    day = db.func.strftime('%Y-%m-%d', Post.date_posted)
+    for date, count in db.session.query(day, db.func.count()).group_by(day):
+        counts[f'stats:posts_per_day:{date}'] = count
+    now = datetime.utcnow()
+    db.session.add_all([Counter(name=name, value=value, updated_at=now) for name, value in counts.items()])
+    db.session.commit()
+
+# 读取统计计数器：总数和各身份用户数（行数固定，主键范围查询一次读出）；
+# 每日发帖数每天新增一行，只在 days 大于 0 时读取最近 days 天
+def read_stats(days=0):
+    stats = {'users': 0, 'users_by_role': {}, 'posts': 0, 'comments': 0}
+    condition = db.or_(
+        Counter.name.in_(['stats:users', 'stats:posts', 'stats:comments']),
+        db.and_(Counter.name > 'stats:users:', Counter.name < 'stats:users;'),
+    )
+    if days > 0:
+        stats['posts_per_day'] = {}
+        since = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        condition = db.or_(condition, db.and_(Counter.name >= f'stats:posts_per_day:{since}', Counter.name < 'stats:posts_per_day;'))
+    for counter in Counter.query.filter(condition):
+        parts = counter.name.split(':')
+        if len(parts) == 2:
+            stats[parts[1]] = counter.value
+        elif parts[1] == 'users' and counter.value:
+            stats['users_by_role'][parts[2]] = counter.value
+        elif parts[1] == 'posts_per_day' and counter.value:
+            stats['posts_per_day'][parts[2]] = counter.value
+    return stats
+
+# 每个新建的 SQLite 连接注册全文索引触发器用到的分词函数
+@db.event.listens_for(Engine, 'connect')
+def register_search_functions(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, 'create_function'):
+        search.register_functions(dbapi_connection)
@@ -1,18 +1,134 @@
-from flask import render_template, url_for, flash, redirect, request, abort
+from flask import render_template, url_for, flash, redirect, request, abort, jsonify, session, make_response
 from app import app
-from extensions import db
-from models import User, Post, Comment
+from extensions import db, fragment_cache, static_assets, password_hasher, login_throttle
+from credentials import HasherBusy
+import search as fulltext
+from models import User, Post, Comment, Counter, bump_counter, read_stats, delete_posts, delete_comments
 from flask_login import login_user, current_user, logout_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload, contains_eager
+from avatars import store_avatar, avatar_file, avatar_settled, allowed_file
+from datetime import datetime, timedelta
+from functools import wraps
+import hashlib
+import hmac
 import os
 
+# 游标格式: "<发布时间ISO格式>_<帖子id>"
+def encode_cursor(post):
+    return f"{post.date_posted.isoformat()}_{post.id}"
+
+def decode_cursor(cursor):
+    try:
+        date_str, post_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_str), int(post_id)
+    except ValueError:
+        abort(400)
+
+# 读取每页数量参数，限制在配置范围内
+def get_per_page():
+    per_page = request.args.get('per_page', app.config['FEED_PER_PAGE'], type=int)
+    return max(1, min(per_page, app.config['FEED_MAX_PER_PAGE']))
+
+# 按 (发布时间, id) 倒序的游标分页，作者在同一条查询中加载
+def feed_page(cursor=None, per_page=20):
+    query = Post.query.options(joinedload(Post.author))
+    if cursor:
+        date_posted, post_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(Post.date_posted, Post.id) < db.tuple_(date_posted, post_id))
+    posts = query.order_by(Post.date_posted.desc(), Post.id.desc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(posts) > per_page:
+        posts = posts[:per_page]
+        next_cursor = encode_cursor(posts[-1])
+    return posts, next_cursor
+
+# 头像地址，按显示尺寸选择缩略图
+@app.template_global()
+def avatar_url(avatar, display_size):
+    return static_assets.asset_url('profile_pics/' + avatar_file(app.config['UPLOAD_FOLDER'], avatar, display_size))
+
+# 部署指纹：模板和视图代码的内容摘要，启动时计算一次；部署了新的模板或代码后旧 ETag 全部失效，
+# 各工作进程算出的值相同
+def deploy_fingerprint():
+    digest = hashlib.sha256()
+    template_folder = os.path.join(app.root_path, app.template_folder)
+    paths = sorted(os.path.join(template_folder, name) for name in os.listdir(template_folder))
+    for path in paths + [os.path.abspath(__file__)]:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+DEPLOY_FINGERPRINT = deploy_fingerprint()
+
+# 条件响应：以内容版本号（帖子/评论写入时递增）、当前用户及其权限、部署指纹和样式表指纹生成 ETag，
+# 页面未变化时直接返回 304，不加载数据也不渲染模板。
+# 不支持 If-Modified-Since：HTTP 日期只精确到秒，同一秒内的两次写入会被误判为未修改
+def conditional_response(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        # 有待显示的提示消息时页面内容不同，不能复用
+        if '_flashes' in session:
+            return view(*args, **kwargs)
+        counter = db.session.get(Counter, 'content_version')
+        version = counter.value if counter else 0
+        user = ''
+        if current_user.is_authenticated:
+            user = f"{current_user.get_id()}:{current_user.role}:{int(current_user.is_developer)}"
+        etag = hashlib.sha1(
+            f"{request.full_path}|{version}|{user}|{DEPLOY_FINGERPRINT}|{static_assets.fingerprint('css/style.css')}".encode()
+        ).hexdigest()
+        
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return wrapped
+
+# 帖子主体（作者、标题、内容）的缓存片段，与当前用户无关；
+# 作者头像的缩略图还没生成时片段里是原图地址，这时不缓存
+@app.template_global()
+def post_body(post):
+    return fragment_cache.render('post', post.id, post.date_posted, lambda: app.jinja_env.get_template('_post_body.html').render(post=post),
+                                 cacheable=avatar_settled(app.config['UPLOAD_FOLDER'], post.author.avatar))
+
+# 评论主体（作者、时间、内容）的缓存片段，删除按钮等与用户相关的部分不缓存
+@app.template_global()
+def comment_body(comment):
+    return fragment_cache.render('comment', comment.id, comment.date_posted, lambda: app.jinja_env.get_template('_comment_body.html').render(comment=comment),
+                                 cacheable=avatar_settled(app.config['UPLOAD_FOLDER'], comment.author.avatar), group=comment.post_id)
+
 # 主页
 @app.route("/")
 @app.route("/home")
+@conditional_response
 def home():
-    posts = Post.query.order_by(Post.date_posted.desc()).all()
-    return render_template('home.html', posts=posts)
+    per_page = get_per_page()
+    posts, next_cursor = feed_page(request.args.get('cursor'), per_page)
+    return render_template('home.html', posts=posts, next_cursor=next_cursor, per_page=per_page)
+
+# 首页帖子接口（游标分页）
+@app.route("/api/posts")
+def api_posts():
+    posts, next_cursor = feed_page(request.args.get('cursor'), get_per_page())
+    return jsonify({
+        'posts': [{
+            'id': post.id,
+            'title': post.title,
+            'content': post.content,
+            'date_posted': post.date_posted.isoformat(),
+            'url': url_for('post', post_id=post.id),
+            'author': {
+                'nickname': post.author.nickname,
+                'role': post.author.role,
+                'avatar': avatar_url(post.author.avatar, 40)
+            }
+        } for post in posts],
+        'next_cursor': next_cursor
+    })
 
 # 注册
 @app.route("/register", methods=['GET', 'POST'])
@@ -30,19 +146,24 @@ def register():
             flash('昵称已被使用，请选择其他昵称', 'danger')
             return redirect(url_for('register'))
         
-        # 处理头像上传
+        # 密码哈希在进程池中计算，队列已满时直接提示繁忙
+        try:
+            hashed_password = password_hasher.hash(password)
+        except HasherBusy:
+            flash('服务器繁忙，请稍后再试', 'danger')
+            return render_template('register.html'), 503
+        
+        # 处理头像上传：分块写入磁盘，按内容哈希命名，缩略图在后台生成
         avatar = 'default.jpg'
         if 'avatar' in request.files:
             file = request.files['avatar']
             if file.filename != '':
-                filename = secure_filename(file.filename)
-                # 确保文件名唯一
-                filename = f"{nickname}_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                avatar = filename
+                if not allowed_file(file.filename):
+                    flash('头像只支持 png、jpg、gif、webp 格式', 'danger')
+                    return redirect(url_for('register'))
+                avatar = store_avatar(file.stream, file.filename, app.config['UPLOAD_FOLDER'])
         
         # 创建新用户
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
         user = User(nickname=nickname, password=hashed_password, role=role, avatar=avatar)
         db.session.add(user)
         db.session.commit()
@@ -60,11 +181,31 @@ def login():
         nickname = request.form['nickname']
         password = request.form['password']
         
+        # 连续失败过多的昵称暂时锁定，不再计算哈希
+        locked_for = login_throttle.locked_for(nickname)
+        if locked_for:
+            flash(f'登录失败次数过多，请 {locked_for} 秒后再试', 'danger')
+            return render_template('login.html'), 429
+        
         user = User.query.filter_by(nickname=nickname).first()
-        if user and check_password_hash(user.password, password):
+        try:
+            verified = user is not None and password_hasher.verify(user.password, password)
+        except HasherBusy:
+            flash('服务器繁忙，请稍后再试', 'danger')
+            return render_template('login.html'), 503
+        if verified:
+            login_throttle.record_success(nickname)
+            # KDF 参数调整后，登录成功时顺便用新参数重新哈希
+            if password_hasher.needs_rehash(user.password):
+                try:
+                    user.password = password_hasher.hash(password)
+                    db.session.commit()
+                except HasherBusy:
+                    pass
             login_user(user)
             return redirect(url_for('home'))
         else:
+            login_throttle.record_failure(nickname)
             flash('登录失败，请检查昵称和密码', 'danger')
     return render_template('login.html')
 
@@ -83,19 +224,55 @@ def new_post():
         title = request.form['title']
         content = request.form['content']
         
-        post = Post(title=title, content=content, author=current_user)
+        post = Post(title=title, content=content, user_id=current_user.id)
         db.session.add(post)
+        bump_counter('content_version')
         db.session.commit()
         
         flash('帖子发布成功！', 'success')
         return redirect(url_for('home'))
     return render_template('create_post.html')
 
+# 全文检索帖子或评论，按相关度排序分页；命中的记录和作者各用一条查询加载
+@app.route("/search")
+def search():
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'posts')
+    if kind not in ('posts', 'comments'):
+        abort(400)
+    per_page = app.config['SEARCH_PER_PAGE']
+    page = max(1, request.args.get('page', 1, type=int))
+    
+    results, total = [], 0
+    if query:
+        model = Post if kind == 'posts' else Comment
+        ids, total = fulltext.search(db.session.connection().exec_driver_sql, model.__tablename__, query,
+                                     limit=per_page, offset=(page - 1) * per_page)
+        if ids:
+            options = [joinedload(model.author)]
+            if model is Comment:
+                options.append(joinedload(Comment.post))
+            found = {item.id: item for item in model.query.options(*options).filter(model.id.in_(ids))}
+            results = [found[item_id] for item_id in ids if item_id in found]
+    pages = max(1, -(-total // per_page))
+    return render_template('search.html', query=query, kind=kind, results=results, total=total, page=page, pages=pages)
+
 # 帖子详情
 @app.route("/post/<int:post_id>")
+@conditional_response
 def post(post_id):
-    post = Post.query.get_or_404(post_id)
-    return render_template('post.html', post=post)
+    # 帖子和作者一条查询，当前页评论和评论作者一条查询
+    post = Post.query.options(joinedload(Post.author)).filter_by(id=post_id).first_or_404()
+    per_page = app.config['COMMENTS_PER_PAGE']
+    pages = max(1, -(-post.comment_count // per_page))
+    page = max(1, min(request.args.get('page', 1, type=int), pages))
+    comments = []
+    if post.comment_count:
+        comments = Comment.query.options(joinedload(Comment.author)) \
+            .filter_by(post_id=post.id) \
+            .order_by(Comment.date_posted, Comment.id) \
+            .offset((page - 1) * per_page).limit(per_page).all()
+    return render_template('post.html', post=post, comments=comments, page=page, pages=pages)
 
 # 添加评论
 @app.route("/post/<int:post_id>/comment", methods=['POST'])
@@ -104,8 +281,10 @@ def add_comment(post_id):
     post = Post.query.get_or_404(post_id)
     content = request.form['content']
     
-    comment = Comment(content=content, author=current_user, post=post)
+    comment = Comment(content=content, user_id=current_user.id, post=post)
     db.session.add(comment)
+    post.comment_count = Post.comment_count + 1
+    bump_counter('content_version')
     db.session.commit()
     
     flash('评论发布成功！', 'success')
@@ -118,11 +297,100 @@ def admin():
     if not current_user.is_developer:
         abort(403)
     
-    total_users = User.query.count()
-    total_posts = Post.query.count()
-    total_comments = Comment.query.count()
+    # 统计数据来自随写入维护的计数器，一次查询读出；页面不显示每日发帖数，不读取
+    stats = read_stats()
+    
+    return render_template('admin.html', stats=stats, fragment_stats=fragment_cache.stats(), hasher_metrics=password_hasher.metrics())
+
+# 统计数据接口（供监控抓取）：开发者登录后可访问，或携带配置的 STATS_TOKEN
+@app.route("/admin/stats.json")
+def admin_stats():
+    token = app.config.get('STATS_TOKEN')
+    provided = request.headers.get('X-Stats-Token') or request.args.get('token', '')
+    if not (token and hmac.compare_digest(provided.encode(), token.encode())):
+        if not (current_user.is_authenticated and current_user.is_developer):
+            abort(403)
+    stats = read_stats(app.config['STATS_DAYS'])
+    stats['fragment_cache'] = fragment_cache.stats()
+    stats['password_hasher'] = password_hasher.metrics()
+    return jsonify(stats)
+
+# 审核列表的筛选条件（查询参数）：作者昵称、作者身份、发布日期范围
+def moderation_filters():
+    filters = {key: request.args.get(key, '').strip() for key in ('author', 'role', 'date_from', 'date_to')}
+    return {key: value for key, value in filters.items() if value}
+
+# 在数据库中按筛选条件查询帖子或评论，作者用同一条查询加载，按发布时间倒序
+def moderation_query(model, filters):
+    query = model.query.join(model.author).options(contains_eager(model.author))
+    if 'author' in filters:
+        query = query.filter(User.nickname == filters['author'])
+    if 'role' in filters:
+        query = query.filter(User.role == filters['role'])
+    try:
+        if 'date_from' in filters:
+            query = query.filter(model.date_posted >= datetime.strptime(filters['date_from'], '%Y-%m-%d'))
+        if 'date_to' in filters:
+            query = query.filter(model.date_posted < datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        abort(400)
+    return query.order_by(model.date_posted.desc(), model.id.desc())
+
+# 帖子审核列表
+@app.route("/admin/posts")
+@login_required
+def admin_posts():
+    if not current_user.is_developer:
+        abort(403)
+    
+    filters = moderation_filters()
+    pagination = moderation_query(Post, filters).paginate(
+        page=request.args.get('page', 1, type=int), per_page=app.config['ADMIN_PER_PAGE'], error_out=False)
+    return render_template('admin_queue.html', kind='posts', pagination=pagination, filters=filters)
+
+# 评论审核列表
+@app.route("/admin/comments")
+@login_required
+def admin_comments():
+    if not current_user.is_developer:
+        abort(403)
+    
+    filters = moderation_filters()
+    pagination = moderation_query(Comment, filters).paginate(
+        page=request.args.get('page', 1, type=int), per_page=app.config['ADMIN_PER_PAGE'], error_out=False)
+    return render_template('admin_queue.html', kind='comments', pagination=pagination, filters=filters)
+
+# 批量删除选中的帖子及其评论，完成后回到原来的筛选和页码
+@app.route("/admin/posts/delete", methods=['POST'])
+@login_required
+def admin_delete_posts():
+    if not current_user.is_developer:
+        abort(403)
+    
+    post_ids = request.form.getlist('ids', type=int)
+    deleted = delete_posts(post_ids)
+    if deleted:
+        bump_counter('content_version')
+        db.session.commit()
+        fragment_cache.invalidate('post', post_ids)
+        fragment_cache.invalidate_group('comment', post_ids)
+        flash(f'已删除 {deleted} 篇帖子', 'success')
+    return redirect(url_for('admin_posts', **request.args))
+
+# 批量删除选中的评论
+@app.route("/admin/comments/delete", methods=['POST'])
+@login_required
+def admin_delete_comments():
+    if not current_user.is_developer:
+        abort(403)
     
-    return render_template('admin.html', total_users=total_users, total_posts=total_posts, total_comments=total_comments)
+    comment_ids = delete_comments(request.form.getlist('ids', type=int))
+    if comment_ids:
+        bump_counter('content_version')
+        db.session.commit()
+        fragment_cache.invalidate('comment', comment_ids)
+        flash(f'已删除 {len(comment_ids)} 条评论', 'success')
+    return redirect(url_for('admin_comments', **request.args))
 
 # 删除帖子
 @app.route("/admin/delete_post/<int:post_id>")
@@ -131,9 +399,12 @@ def delete_post(post_id):
     if not current_user.is_developer:
         abort(403)
     
-    post = Post.query.get_or_404(post_id)
-    db.session.delete(post)
+    Post.query.get_or_404(post_id)
+    delete_posts([post_id])
+    bump_counter('content_version')
     db.session.commit()
+    fragment_cache.invalidate('post', [post_id])
+    fragment_cache.invalidate_group('comment', [post_id])
     
     flash('帖子已删除', 'success')
     return redirect(url_for('admin'))
@@ -145,12 +416,15 @@ def delete_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
     
     # 只有评论作者或开发者可以删除评论
-    if not (current_user.is_developer or comment.author == current_user):
+    if not (current_user.is_developer or comment.user_id == current_user.id):
         abort(403)
     
     post_id = comment.post_id
     db.session.delete(comment)
+    Post.query.filter_by(id=post_id).update({Post.comment_count: Post.comment_count - 1})
+    bump_counter('content_version')
     db.session.commit()
+    fragment_cache.invalidate('comment', [comment_id])
     
     flash('评论已删除', 'success')
     return redirect(url_for('post', post_id=post_id))
@@ -167,10 +441,15 @@ def init_developers():
         {'nickname': 'dev5', 'password': 'dev123', 'role': 'parent'}
     ]
     
+    existing = {nickname for nickname, in db.session.query(User.nickname).filter(User.nickname.in_([dev['nickname'] for dev in developers]))}
     for dev in developers:
-        user = User.query.filter_by(nickname=dev['nickname']).first()
-        if not user:
-            hashed_password = generate_password_hash(dev['password'], method='pbkdf2:sha256')
+        if dev['nickname'] not in existing:
+            try:
+                hashed_password = password_hasher.hash(dev['password'])
+            except HasherBusy:
+                db.session.rollback()
+                flash('服务器繁忙，请稍后再试', 'danger')
+                return redirect(url_for('home'))
             user = User(nickname=dev['nickname'], password=hashed_password, role=dev['role'], is_developer=True)
             db.session.add(user)
     
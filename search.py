@@ -0,0 +1,72 @@
+import re
+
+# 全文检索（SQLite FTS5），Flask 和 Streamlit 两个应用共用
+# 中文没有空格分词，写入索引前把每个汉字（及假名、谚文）拆成单独的词元，
+# 查询时把连续的字组成短语，按词元位置匹配，效果等同于子串匹配；
+# 英文和数字仍按单词索引（unicode61 分词器，忽略大小写）
+
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]')
+_TOKEN = re.compile(r'\w+')
+
+# 索引文本分词：汉字两侧加空格
+def segment(text):
+    return _CJK.sub(lambda match: f' {match.group()} ', text or '')
+
+# 把用户输入转成 FTS5 MATCH 表达式：每个以空格分隔的词是一个短语，多个词之间为 AND；
+# 没有可检索的字符时返回 None
+def match_expression(query):
+    phrases = []
+    for term in (query or '').split():
+        tokens = _TOKEN.findall(segment(term))
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"')
+    return ' '.join(phrases) or None
+
+# 注册索引触发器使用的 SQL 函数，每个数据库连接都要调用一次
+def register_functions(dbapi_connection):
+    dbapi_connection.create_function('segment', 1, segment, deterministic=True)
+
+def index_name(table):
+    return f'{table}_fts'
+
+# 建立索引表和同步触发器的语句：写入、删除、修改源表时在同一事务中更新索引，
+# 批量 DELETE 语句也会触发；weights 为各列的 bm25 权重
+def index_statements(table, key, columns, weights=None):
+    fts = index_name(table)
+    values = ', '.join(f'segment(new.{column})' for column in columns)
+    assignments = ', '.join(f'{column} = segment(new.{column})' for column in columns)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({', '.join(columns)}, tokenize = 'unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts} (rowid, {', '.join(columns)}) VALUES (new.{key}, {values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = old.{key}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {', '.join(columns)} ON {table} BEGIN "
+        f"UPDATE {fts} SET {assignments} WHERE rowid = new.{key}; END",
+    ]
+    if weights:
+        statements.append(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25({', '.join(str(w) for w in weights)})')")
+    return statements
+
+# 按源表现有数据重建索引（首次建立索引或索引损坏时使用）
+def rebuild_statements(table, key, columns):
+    fts = index_name(table)
+    values = ', '.join(f'segment({column})' for column in columns)
+    return [
+        f"DELETE FROM {fts}",
+        f"INSERT INTO {fts} (rowid, {', '.join(columns)}) SELECT {key}, {values} FROM {table}",
+    ]
+
+# 检索，返回 (按相关度排序的当前页 id 列表, 命中总数)；
+# execute 为执行带 ? 参数 SQL 的函数（sqlite3 的 conn.execute 或 SQLAlchemy 的 exec_driver_sql）
+def search(execute, table, query, limit=20, offset=0):
+    expression = match_expression(query)
+    if expression is None:
+        return [], 0
+    fts = index_name(table)
+    total = execute(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?", (expression,)).fetchone()[0]
+    rows = execute(
+        f"SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+        (expression, limit, offset)
+    ).fetchall()
+    return [row[0] for row in rows], total
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+
+# 会话恢复用的只读用户身份记录，字段与模板和路由中用到的 User 属性一致
+class CachedUser(UserMixin):
+    def __init__(self, user):
+        self.id = user.id
+        self.nickname = user.nickname
+        self.role = user.role
+        self.avatar = user.avatar
+        self.is_developer = bool(user.is_developer)
+
+# Flask-Login 用户加载缓存：LRU + TTL；用户行变化时由模型事件主动失效，
+# 其他进程中的变化最多在 TTL 内可见
+class UserCache:
+    def __init__(self, ttl=60, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.max_size = app.config.get('USER_CACHE_SIZE', self.max_size)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, record = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return record
+
+    def set(self, user):
+        record = CachedUser(user)
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()